@@ -0,0 +1,189 @@
+import base64
+import html
+import json
+import os
+import re
+import sys
+from datetime import datetime
+from functools import partial
+from io import BytesIO
+
+import wx
+import wx.html2
+
+from image_cache import IMG_TAG, IMG_SRC, image_url
+
+class CachedImageHandler(wx.html2.WebViewHandler):
+
+    # Serves images from the image cache to the web view by URL, so putting an article on the page costs the
+    # same whether or not its images are cached, and each image is only read from disk when the web view loads
+    # it (lazily, for images further down).
+    SCHEME = 'yaffle-img'
+
+    def __init__(self, image_cache, backend):
+        super().__init__(self.SCHEME)
+        self.image_cache = image_cache
+        # Edge can't have schemes of its own, so there wx serves a handler from https://<virtual host>/ instead
+        if backend == wx.html2.WebViewBackendEdge:
+            self.prefix = f"https://{self.GetVirtualHost()}/"
+        else:
+            self.prefix = f"{self.SCHEME}:"
+
+    def image_src(self, url):
+        # the image's own URL is encoded so no backend can mangle its slashes or query string
+        return self.prefix + base64.urlsafe_b64encode(url.encode('utf-8')).decode('ascii')
+
+    def GetFile(self, uri):
+        # called by the web view, on the main thread, for each image it loads
+        if not uri.startswith(self.prefix):
+            return None
+        try:
+            url = base64.urlsafe_b64decode(uri[len(self.prefix):].split('?')[0]).decode('utf-8')
+        except ValueError:
+            return None
+        cached = self.image_cache.get(url)
+        if cached is None:
+            return None
+        image_data, content_type = cached
+        return wx.FSFile(BytesIO(image_data), uri, content_type, '', wx.DateTime.Now())
+
+class ArticleRenderer:
+
+    STYLE_CACHE_DIR = 'style_cache'
+    STYLESHEETS = ['bootstrap.min.css', 'app.css']
+
+    EXTRA_STYLE = """.content-wrapper { margin: 0 auto 0 1em !important; } h1 a {text-decoration: none !important;} .content-body a {position:relative} .content-body a[href^="http"]:hover::after { content: attr(href); position: absolute; left: 2em; top: -2em; min-width: 200px; border: 1px #aaaaaa solid; background-color: #ffffcc; border-radius: 10px; padding: 6px; color: #000000; font-size: 14px; z-index: 1; text-wrap: nowrap;}"""
+
+    # the page chrome is loaded into the web view once; after that only the article is swapped in by script
+    SHELL = """<!DOCTYPE html><html lang="en"><head>
+        <style id="yarr-stylesheets">{stylesheets}</style>
+        <style>{extra_style}</style>
+        <script>
+        function showArticle(articleHtml) {{
+            document.getElementById('article').innerHTML = articleHtml;
+            window.scrollTo(0, 0);
+        }}
+        function setStylesheets(css) {{
+            document.getElementById('yarr-stylesheets').textContent = css;
+        }}
+        </script>
+        </head><body>
+        <div class="content px-4 pt-3 pb-5 border-top overflow-auto" style="font-size: 1rem;"><div class="content-wrapper" id="article">{article}</div></div>
+        </body></html>"""
+
+    LOADING_ATTRIBUTE = re.compile(r'\bloading\s*=', re.IGNORECASE)
+    SRCSET_ATTRIBUTE = re.compile(r'\s(?:srcset|sizes)\s*=\s*(["\'])(.*?)\1', re.IGNORECASE | re.DOTALL)
+
+    def __init__(self, web_view, yarr_client, background_tasks, image_handler=None, style_cache_dir=STYLE_CACHE_DIR):
+        self.web_view = web_view
+        self.yarr_client = yarr_client
+        self.background_tasks = background_tasks
+        # a CachedImageHandler registered with the web view, if cached images should be served from disk
+        self.image_handler = image_handler
+        self.style_cache_dir = style_cache_dir
+        self.web_view.Bind(wx.html2.EVT_WEBVIEW_LOADED, self.on_shell_loaded)
+
+        # Yarr's stylesheets are fetched once and kept on disk, then inlined into the shell so opening an
+        # article never makes a stylesheet request
+        self.stylesheets = self.load_cached_stylesheets()
+        self.background_tasks.submit(self.fetch_stylesheets, self.on_stylesheets_fetched)
+
+        self.shell_ready = False
+        self.pending_article = None
+        self.web_view.SetPage(self.SHELL.format(stylesheets=self.stylesheets or '', extra_style=self.EXTRA_STYLE, article=''), '')
+
+    @classmethod
+    def create(cls, parent, yarr_client, background_tasks, image_cache=None):
+        # makes the web view along with its renderer. Handlers have to be registered before the web view is
+        # created on some backends, hence the two steps.
+        backend = wx.html2.WebViewBackendDefault
+        if sys.platform == 'win32' and wx.html2.WebView.IsBackendAvailable(wx.html2.WebViewBackendEdge):
+            backend = wx.html2.WebViewBackendEdge
+        web_view = wx.html2.WebView.New(backend)
+        image_handler = None
+        if image_cache is not None:
+            image_handler = CachedImageHandler(image_cache, backend)
+            web_view.RegisterHandler(image_handler)
+        web_view.Create(parent)
+        return cls(web_view, yarr_client, background_tasks, image_handler)
+
+    def load_cached_stylesheets(self):
+        try:
+            css = []
+            for name in self.STYLESHEETS:
+                with open(os.path.join(self.style_cache_dir, name), 'r', encoding='utf-8') as stylesheet_file:
+                    css.append(stylesheet_file.read())
+            return '\n'.join(css)
+        except OSError:
+            return None
+
+    def fetch_stylesheets(self):
+        # runs on a worker thread; refreshes the cache for next time even if we already had a copy
+        css = [self.yarr_client.get_stylesheet(name) for name in self.STYLESHEETS]
+        try:
+            os.makedirs(self.style_cache_dir, exist_ok=True)
+            for name, stylesheet in zip(self.STYLESHEETS, css):
+                with open(os.path.join(self.style_cache_dir, name), 'w', encoding='utf-8') as stylesheet_file:
+                    stylesheet_file.write(stylesheet)
+        except OSError as e:
+            print(f"Failed to cache stylesheets: {e}")
+        return '\n'.join(css)
+
+    def on_stylesheets_fetched(self, css):
+        # only needed on the very first run; otherwise the cached copy is already in the page. If the shell is
+        # still loading, on_shell_loaded puts them in instead.
+        if self.stylesheets is None:
+            self.stylesheets = css
+            self.run_script(f"setStylesheets({json.dumps(css)})")
+
+    def on_shell_loaded(self, event):
+        if not self.shell_ready:
+            self.shell_ready = True
+            if self.stylesheets is not None:
+                self.run_script(f"setStylesheets({json.dumps(self.stylesheets)})")
+            if self.pending_article is not None:
+                self.run_script(f"showArticle({json.dumps(self.pending_article)})")
+                self.pending_article = None
+        event.Skip()
+
+    def run_script(self, script):
+        if self.shell_ready:
+            self.web_view.RunScriptAsync(script)
+
+    def show_html(self, article_html):
+        if not self.shell_ready:
+            # the shell is still loading, so show this as soon as it's ready
+            self.pending_article = article_html
+            return
+        self.run_script(f"showArticle({json.dumps(article_html)})")
+
+    def show_loading(self):
+        self.show_html("<div class='text-muted'>Loading...</div>")
+
+    def show_article(self, data, item_title, feed_title):
+        dt = datetime.fromisoformat(data['date'])
+        item_date = dt.strftime("%#d %B %Y at %H:%M")
+
+        content_metadata = f"""
+<div class="text-muted"><div>{html.escape(feed_title)}</div> <time>{item_date}</time></div>
+"""
+        item_content = IMG_TAG.sub(partial(self.rewrite_image, base_url=data['link']), data['content'] or '')
+
+        self.show_html(f"<h1><a href=\"{html.escape(data['link'] or '')}\">{html.escape(item_title)}</a></h1>"
+                       f"{content_metadata}<hr><div class='content-body'>{item_content}</div>")
+
+    def rewrite_image(self, match, base_url):
+        tag = match.group(0)
+        src = IMG_SRC.search(tag)
+        url = None
+        if src is not None and self.image_handler is not None:
+            url = image_url(src.group(2), base_url)
+        if url is not None and url in self.image_handler.image_cache:
+            # images we already have are served from the cache, so they never touch the network; any srcset goes
+            # too, otherwise the web view would download one of those instead
+            tag = tag[:src.start()] + f'src="{html.escape(self.image_handler.image_src(url))}"' + tag[src.end():]
+            tag = self.SRCSET_ATTRIBUTE.sub('', tag)
+        if not self.LOADING_ATTRIBUTE.search(tag):
+            # images further down the article are only fetched as they scroll into view
+            tag = '<img loading="lazy" decoding="async"' + tag[len('<img'):]
+        return tag
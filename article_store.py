@@ -0,0 +1,244 @@
+import html
+import re
+import sqlite3
+import threading
+import time
+
+class ArticleStore:
+
+    DATABASE_FILE = 'yaffle.db'
+    PAGE_SIZE = 20 # the same as Yarr, so local and remote pages line up
+    MAX_AGE_DAYS = 30
+    MAX_ITEMS = 50000
+    # how long a write waits for another connection's (e.g. `yaffle sync` alongside the app) to finish
+    BUSY_TIMEOUT = 10 # seconds
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS folders (id INTEGER PRIMARY KEY, title TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS feeds (id INTEGER PRIMARY KEY, folder_id INTEGER, title TEXT NOT NULL, has_icon INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY,
+            feed_id INTEGER NOT NULL,
+            title TEXT,
+            link TEXT,
+            date TEXT,
+            status TEXT,
+            content TEXT,
+            stored_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS items_feed_date ON items (feed_id, date DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS items_status ON items (status);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    # full-text index over titles and the text (not the markup) of article content, kept up to date by triggers
+    # so anything that writes items - the app or a sync - indexes them as it goes
+    SEARCH_SCHEMA = """
+        CREATE VIRTUAL TABLE items_fts USING fts5(title, content, content='items', content_rowid='id', prefix='2 3 4');
+        CREATE TRIGGER items_fts_insert AFTER INSERT ON items BEGIN
+            INSERT INTO items_fts (rowid, title, content) VALUES (new.id, new.title, strip_html(new.content));
+        END;
+        CREATE TRIGGER items_fts_delete AFTER DELETE ON items BEGIN
+            INSERT INTO items_fts (items_fts, rowid, title, content) VALUES ('delete', old.id, old.title, strip_html(old.content));
+        END;
+        CREATE TRIGGER items_fts_update AFTER UPDATE OF title, content ON items
+        WHEN old.title IS NOT new.title OR old.content IS NOT new.content BEGIN
+            INSERT INTO items_fts (items_fts, rowid, title, content) VALUES ('delete', old.id, old.title, strip_html(old.content));
+            INSERT INTO items_fts (rowid, title, content) VALUES (new.id, new.title, strip_html(new.content));
+        END;
+        INSERT INTO items_fts (rowid, title, content) SELECT id, title, strip_html(content) FROM items;
+    """
+    SEARCH_LIMIT = 200
+    # only the most recent matches for a query are ranked, which keeps common words fast on a large store
+    SEARCH_CANDIDATES = 2000
+
+    def __init__(self, database_file=DATABASE_FILE, max_age_days=MAX_AGE_DAYS, max_items=MAX_ITEMS):
+        self.max_age_days = max_age_days
+        self.max_items = max_items
+        # one connection shared by the UI and the worker threads; sqlite3 serialises access but a lock keeps
+        # multi-statement writes together
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_file, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        # the search triggers call this, so every connection to the database needs it
+        self.connection.create_function('strip_html', 1, strip_html, deterministic=True)
+        with self.lock:
+            # WAL lets readers carry on while a write is in progress, including from other processes
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript(self.SCHEMA)
+            self.search_available = self.create_search_index()
+
+    def create_search_index(self):
+        # callers must hold the lock
+        if self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'").fetchone() is not None:
+            return True
+        try:
+            self.connection.executescript(f"BEGIN; {self.SEARCH_SCHEMA} COMMIT;")
+            return True
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5 still get the offline store, just not search
+            self.connection.rollback()
+            print(f"Search is not available: {e}")
+            return False
+
+    @classmethod
+    def from_config(cls, config):
+        # the store is optional: returns None unless it's turned on in yaffle.ini
+        if not config.getboolean('offline_store', fallback=False):
+            return None
+        return cls(config.get('store_file', fallback=cls.DATABASE_FILE),
+                   max_age_days=config.getint('store_max_age_days', fallback=cls.MAX_AGE_DAYS),
+                   max_items=config.getint('store_max_items', fallback=cls.MAX_ITEMS))
+
+    def replace_folders_and_feeds(self, folder_data, feed_data):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM folders')
+            self.connection.executemany('INSERT INTO folders (id, title) VALUES (?, ?)',
+                                        [(folder['id'], folder['title']) for folder in folder_data])
+            self.connection.execute('DELETE FROM feeds')
+            self.connection.executemany('INSERT INTO feeds (id, folder_id, title, has_icon) VALUES (?, ?, ?, ?)',
+                                        [(feed['id'], feed['folder_id'], feed['title'], feed['has_icon'] is True)
+                                         for feed in feed_data])
+
+    def upsert_items(self, item_data):
+        # items from /api/items lists may not include content, so never overwrite stored content with nothing
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany("""
+                INSERT INTO items (id, feed_id, title, link, date, status, content, stored_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    title = excluded.title, link = excluded.link, date = excluded.date, status = excluded.status,
+                    content = COALESCE(excluded.content, items.content)
+                """, [(item['id'], item['feed_id'], item.get('title'), item.get('link'), item.get('date'),
+                       item.get('status'), item.get('content'), now) for item in item_data])
+
+    def update_item_status(self, item_id, status):
+        with self.lock, self.connection:
+            self.connection.execute('UPDATE items SET status = ? WHERE id = ?', (status, item_id))
+
+    def mark_items_read(self, feed_ids):
+        with self.lock, self.connection:
+            self.connection.executemany("UPDATE items SET status = 'read' WHERE feed_id = ? AND status = 'unread'",
+                                        [(feed_id,) for feed_id in feed_ids])
+
+    def reconcile_unread(self, feed_id, unread_ids):
+        # given every item in a feed that Yarr says is unread, mark anything else we think is unread as read
+        with self.lock, self.connection:
+            local_ids = {row[0] for row in self.connection.execute(
+                "SELECT id FROM items WHERE feed_id = ? AND status = 'unread'", (feed_id,))}
+            self.connection.executemany("UPDATE items SET status = 'read' WHERE id = ?",
+                                        [(item_id,) for item_id in local_ids - set(unread_ids)])
+
+    def unread_counts(self):
+        # feed ID -> number of unread items stored for it
+        with self.lock:
+            return dict(self.connection.execute(
+                "SELECT feed_id, COUNT(*) FROM items WHERE status = 'unread' GROUP BY feed_id").fetchall())
+
+    def ids_with_content(self, item_ids):
+        item_ids = list(item_ids)
+        found = set()
+        with self.lock:
+            # in chunks, to stay well under SQLite's limit on the number of parameters
+            for start in range(0, len(item_ids), 500):
+                chunk = item_ids[start:start + 500]
+                found.update(row[0] for row in self.connection.execute(
+                    f"SELECT id FROM items WHERE content IS NOT NULL AND id IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, key, value):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def get_item(self, item_id):
+        # returns the item in the same shape as /api/items/{id}, or None if we don't have its content
+        with self.lock:
+            row = self.connection.execute('SELECT * FROM items WHERE id = ? AND content IS NOT NULL', (item_id,)).fetchone()
+        return self.row_to_item(row) if row is not None else None
+
+    def get_items_page(self, feed_id=None, folder_id=None, status=None, after=None):
+        # the same shape and cursor pagination as /api/items: newest first, continuing after the given item ID
+        conditions = []
+        parameters = []
+        if feed_id is not None:
+            conditions.append('feed_id = ?')
+            parameters.append(feed_id)
+        if folder_id is not None:
+            conditions.append('feed_id IN (SELECT id FROM feeds WHERE folder_id = ?)')
+            parameters.append(folder_id)
+        if status is not None:
+            conditions.append('status = ?')
+            parameters.append(status)
+        if after is not None:
+            conditions.append('(date, id) < (SELECT date, id FROM items WHERE id = ?)')
+            parameters.append(after)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self.lock:
+            rows = self.connection.execute(f"""
+                SELECT id, feed_id, title, link, date, status FROM items {where}
+                ORDER BY date DESC, id DESC LIMIT ?""", parameters + [self.PAGE_SIZE + 1]).fetchall()
+        return {'list': [self.row_to_item(row) for row in rows[:self.PAGE_SIZE]],
+                'has_more': len(rows) > self.PAGE_SIZE}
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        # best matches first, with title matches counting for more than matches in the body
+        match = search_query(query)
+        if not self.search_available or match is None:
+            return {'list': [], 'has_more': False}
+        with self.lock:
+            # Yarr's item IDs go up as items arrive, so walking the index in descending rowid order finds the
+            # most recent matches without looking at the rest
+            candidates = self.connection.execute("""
+                SELECT rowid FROM items_fts WHERE items_fts MATCH ? ORDER BY rowid DESC LIMIT ?""",
+                (match, self.SEARCH_CANDIDATES)).fetchall()
+            if not candidates:
+                return {'list': [], 'has_more': False}
+            rows = self.connection.execute("""
+                SELECT items.id, items.feed_id, items.title, items.link, items.date, items.status
+                FROM items_fts JOIN items ON items.id = items_fts.rowid
+                WHERE items_fts MATCH ? AND items_fts.rowid >= ?
+                ORDER BY bm25(items_fts, 10.0, 1.0) LIMIT ?""", (match, candidates[-1][0], limit)).fetchall()
+        return {'list': [self.row_to_item(row) for row in rows], 'has_more': False}
+
+    def row_to_item(self, row):
+        return {key: row[key] for key in row.keys() if key != 'stored_at'}
+
+    def apply_retention(self):
+        # unread items are always kept; read ones go once they're old, or once there are too many items
+        cutoff = time.time() - self.max_age_days * 24 * 60 * 60
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM items WHERE status != 'unread' AND stored_at < ?", (cutoff,))
+            self.connection.execute("""
+                DELETE FROM items WHERE id IN (
+                    SELECT id FROM items WHERE status != 'unread' ORDER BY date DESC, id DESC LIMIT -1 OFFSET ?
+                )""", (self.max_items,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+TAG_PATTERN = re.compile(r'<[^>]*>')
+
+def strip_html(content):
+    if content is None:
+        return None
+    return html.unescape(TAG_PATTERN.sub(' ', content))
+
+def search_query(query):
+    # turn what was typed into an FTS5 query: every word must match, and the last one can be the start of a
+    # word so results appear as you type (from two letters, which the prefix index covers)
+    words = query.split()
+    if not words:
+        return None
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    if len(words[-1]) >= 2:
+        terms[-1] += '*'
+    return ' '.join(terms)
@@ -0,0 +1,70 @@
+import threading
+
+import wx
+
+from worker_pool import WorkerPool
+
+class BackgroundTasks:
+
+    MAX_WORKERS = 4
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.executor = WorkerPool(max_workers, thread_name_prefix='background')
+        # channel name -> number of the latest request made on it, and the future running it
+        self.generations = {}
+        self.futures = {}
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def submit(self, work, on_done=None, on_error=None):
+        # run work() on a worker thread, then hand its result (or exception) to the callbacks on the main thread
+        return self.executor.submit(self.run, None, None, work, on_done, on_error)
+
+    def submit_latest(self, channel, work, on_done, on_error=None):
+        # like submit, but only the most recent request on a channel is delivered: anything still queued is
+        # cancelled and anything already in flight has its result dropped when it comes back
+        with self.lock:
+            generation = self.generations.get(channel, 0) + 1
+            self.generations[channel] = generation
+            previous = self.futures.get(channel)
+            if previous is not None:
+                previous.cancel()
+            self.futures[channel] = self.executor.submit(self.run, channel, generation, work, on_done, on_error)
+
+    def cancel(self, channel):
+        with self.lock:
+            self.generations[channel] = self.generations.get(channel, 0) + 1
+            previous = self.futures.pop(channel, None)
+            if previous is not None:
+                previous.cancel()
+
+    def is_current(self, channel, generation):
+        if channel is None:
+            return True
+        with self.lock:
+            return self.generations.get(channel) == generation
+
+    def run(self, channel, generation, work, on_done, on_error):
+        # a newer request may have superseded this one while it sat in the queue
+        if not self.is_current(channel, generation):
+            return
+        try:
+            result = work()
+        except Exception as e:
+            if on_error is None:
+                print(f"Background task failed: {e}")
+                return
+            wx.CallAfter(self.deliver, channel, generation, on_error, e)
+            return
+        wx.CallAfter(self.deliver, channel, generation, on_done, result)
+
+    def deliver(self, channel, generation, callback, result):
+        # checked again here on the main thread, which is where new requests are made, so there is no race
+        if self.closed or callback is None or not self.is_current(channel, generation):
+            return
+        callback(result)
+
+    def shutdown(self):
+        # results that arrive after this are dropped, as the windows they were for are going away
+        self.closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,246 @@
+# A stand-in for the parts of Yarr's API that Yaffle uses, with generated folders, feeds, items and icons and
+# optional added latency, so benchmarks give the same answers on any machine and don't need a real Yarr.
+#
+#   poetry run python benchmarks/fake_yarr.py --feeds 500 --latency-ms 50
+#
+# then point YARR_URL in yaffle.ini at the address it prints.
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image, ImageDraw
+
+PAGE_SIZE = 20 # the same as Yarr
+
+class FakeYarr:
+
+    def __init__(self, folders=10, feeds=200, items_per_feed=100, unread_per_feed=10, icons=None,
+                 distinct_icons=50, content_bytes=8000, latency_ms=0, jitter_ms=0, seed=1):
+        # icons is how many feeds have one (all of them by default); distinct_icons is how many different
+        # icons they share between them, since lots of feeds use the same one in practice
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+        self.content_bytes = content_bytes
+        self.lock = threading.Lock()
+        self.requests = 0
+        # the next this many requests get this status instead of an answer, to exercise retries
+        self.failures = 0
+        self.failure_status = 503
+
+        self.folders = [{'id': folder_id, 'title': f"Folder {folder_id}", 'is_expanded': True}
+                        for folder_id in range(1, folders + 1)]
+        icons = feeds if icons is None else icons
+        self.feeds = []
+        for feed_id in range(1, feeds + 1):
+            # a few feeds sit outside any folder, as they do in Yarr
+            folder_id = None if not folders or feed_id % 10 == 0 else (feed_id % folders) + 1
+            self.feeds.append({'id': feed_id, 'folder_id': folder_id, 'title': f"Feed {feed_id}",
+                               'description': '', 'link': f"https://example.com/{feed_id}",
+                               'feed_link': f"https://example.com/{feed_id}/feed", 'has_icon': feed_id <= icons})
+        self.icons = [make_icon(index, self.random) for index in range(max(1, distinct_icons))]
+
+        # item IDs go up over time, like Yarr's, so newer items have higher IDs
+        self.items = {}
+        self.items_by_feed = {feed['id']: [] for feed in self.feeds}
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        item_id = 0
+        for age in reversed(range(items_per_feed)):
+            for feed in self.feeds:
+                item_id += 1
+                item = {'id': item_id, 'feed_id': feed['id'], 'title': f"Item {item_id} in feed {feed['id']}",
+                        'link': f"https://example.com/{feed['id']}/{item_id}",
+                        'date': (now - timedelta(hours=age, minutes=feed['id'] % 60)).isoformat(),
+                        'status': 'unread' if age < unread_per_feed else 'read'}
+                self.items[item_id] = item
+                self.items_by_feed[feed['id']].insert(0, item)
+
+        self.items_newest_first = sorted(self.items.values(), key=lambda item: item['id'], reverse=True)
+
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host='127.0.0.1', port=0):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive, like Yarr
+            # headers and body go out in separate writes, which on a keep-alive socket would otherwise wait
+            # ~40ms for a delayed ACK and swamp the latency being simulated
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                fake.handle(self, 'GET')
+
+            def do_PUT(self):
+                fake.handle(self, 'PUT')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='fake-yarr', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fail_next(self, count, status=503):
+        with self.lock:
+            self.failures = count
+            self.failure_status = status
+
+    def handle(self, request, method):
+        with self.lock:
+            self.requests += 1
+            failing = self.failures > 0
+            if failing:
+                self.failures -= 1
+        if self.latency_ms or self.jitter_ms:
+            time.sleep((self.latency_ms + self.random.uniform(0, self.jitter_ms)) / 1000)
+
+        url = urlparse(request.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else b''
+        if failing:
+            return self.respond(request, self.failure_status, b'failed', 'text/plain')
+
+        if method == 'PUT':
+            self.update_status(url.path, query, body)
+            return self.respond(request, 200, b'', 'text/plain')
+        if url.path == '/api/status':
+            return self.respond_json(request, self.status())
+        if url.path == '/api/folders':
+            return self.respond_json(request, self.folders)
+        if url.path == '/api/feeds':
+            return self.respond_json(request, self.feeds)
+        if url.path == '/api/items':
+            return self.respond_json(request, self.item_page(query))
+        match = re.fullmatch(r'/api/items/(\d+)', url.path)
+        if match and int(match.group(1)) in self.items:
+            return self.respond_json(request, self.item(int(match.group(1))))
+        match = re.fullmatch(r'/api/feeds/(\d+)/icon', url.path)
+        if match and 0 < int(match.group(1)) <= len(self.feeds) and self.feeds[int(match.group(1)) - 1]['has_icon']:
+            icon = self.icons[int(match.group(1)) % len(self.icons)]
+            etag = '"' + hashlib.sha1(icon).hexdigest() + '"'
+            if request.headers.get('If-None-Match') == etag:
+                return self.respond(request, 304, b'', None)
+            return self.respond(request, 200, icon, 'image/png', {'ETag': etag})
+        if url.path.startswith('/static/stylesheets/'):
+            return self.respond(request, 200, b'body { font-family: sans-serif; }', 'text/css')
+        self.respond(request, 404, b'not found', 'text/plain')
+
+    def respond_json(self, request, data):
+        self.respond(request, 200, json.dumps(data).encode('utf-8'), 'application/json')
+
+    def respond(self, request, status, body, content_type, headers=None):
+        request.send_response(status)
+        if content_type:
+            request.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def status(self):
+        unread = {}
+        with self.lock:
+            for item in self.items.values():
+                if item['status'] == 'unread':
+                    unread[item['feed_id']] = unread.get(item['feed_id'], 0) + 1
+        return {'running': 0, 'stats': [{'feed_id': feed_id, 'unread': count, 'starred': 0}
+                                        for feed_id, count in unread.items()]}
+
+    def item_page(self, query):
+        if 'feed_id' in query:
+            items = self.items_by_feed.get(int(query['feed_id']), [])
+        else:
+            feed_ids = None
+            if 'folder_id' in query:
+                feed_ids = {feed['id'] for feed in self.feeds if feed['folder_id'] == int(query['folder_id'])}
+            items = [item for item in self.items_newest_first if feed_ids is None or item['feed_id'] in feed_ids]
+        with self.lock:
+            if 'status' in query:
+                items = [item for item in items if item['status'] == query['status']]
+            if 'after' in query:
+                items = [item for item in items if item['id'] < int(query['after'])]
+            page = [dict(item) for item in items[:PAGE_SIZE]]
+        return {'list': page, 'has_more': len(items) > PAGE_SIZE}
+
+    def item(self, item_id):
+        with self.lock:
+            item = dict(self.items[item_id])
+        paragraph = f"<p>Paragraph of item {item_id}, with <a href=\"https://example.com\">a link</a>.</p>"
+        item['content'] = paragraph * max(1, self.content_bytes // len(paragraph))
+        return item
+
+    def update_status(self, path, query, body):
+        with self.lock:
+            match = re.fullmatch(r'/api/items/(\d+)', path)
+            if match and int(match.group(1)) in self.items:
+                self.items[int(match.group(1))]['status'] = json.loads(body or b'{}').get('status', 'read')
+                return
+            if path == '/api/items':
+                feed_ids = {int(query['feed_id'])} if 'feed_id' in query else \
+                    {feed['id'] for feed in self.feeds if 'folder_id' in query and feed['folder_id'] == int(query['folder_id'])}
+                for item in self.items.values():
+                    if item['feed_id'] in feed_ids:
+                        item['status'] = 'read'
+
+def make_icon(index, rng):
+    # a mix of the sizes feeds really use, from tiny favicons to big apple-touch icons
+    size = (16, 32, 64, 180, 512)[index % 5]
+    image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    colour = (rng.randrange(256), rng.randrange(256), rng.randrange(256), 255)
+    draw.ellipse((size // 8, size // 8, size - size // 8, size - size // 8), fill=colour)
+    data = BytesIO()
+    image.save(data, 'PNG')
+    return data.getvalue()
+
+def add_arguments(parser):
+    parser.add_argument('--folders', type=int, default=10)
+    parser.add_argument('--feeds', type=int, default=200)
+    parser.add_argument('--items-per-feed', type=int, default=100)
+    parser.add_argument('--unread-per-feed', type=int, default=10)
+    parser.add_argument('--icons', type=int, default=None, help='how many feeds have icons (default: all)')
+    parser.add_argument('--distinct-icons', type=int, default=50)
+    parser.add_argument('--content-bytes', type=int, default=8000)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+
+def from_arguments(args):
+    return FakeYarr(folders=args.folders, feeds=args.feeds, items_per_feed=args.items_per_feed,
+                    unread_per_feed=args.unread_per_feed, icons=args.icons, distinct_icons=args.distinct_icons,
+                    content_bytes=args.content_bytes, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a fake Yarr server')
+    add_arguments(parser)
+    parser.add_argument('--port', type=int, default=7070)
+    args = parser.parse_args()
+    fake = from_arguments(args).start(port=args.port)
+    print(f"Fake Yarr listening on {fake.url}")
+    try:
+        fake.thread.join()
+    except KeyboardInterrupt:
+        fake.stop()
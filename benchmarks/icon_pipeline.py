@@ -0,0 +1,134 @@
+# Compares the icon pipeline in icon_processing.py with the one it replaced, on a mix of the kinds of icon
+# feeds actually serve: tiny favicons, multi-size .ico files, apple-touch icons and oversized logos.
+#
+#   poetry run python benchmarks/icon_pipeline.py [--iterations N]
+#
+# Each pipeline runs in its own process so peak memory can be compared fairly. Peak memory isn't available
+# on Windows, where only throughput is reported.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PIL import Image, ImageDraw, ImageOps
+
+def sample_icons():
+    def drawing(size, mode='RGBA'):
+        image = Image.new(mode, (size, size), (0, 0, 0, 0) if mode == 'RGBA' else (255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        draw.ellipse((size // 8, size // 8, size - size // 8, size - size // 8), fill=(230, 120, 20))
+        draw.rectangle((size // 3, size // 3, size // 2, size // 2), fill=(20, 60, 200))
+        return image
+
+    def encode(image, format, **options):
+        data = BytesIO()
+        image.save(data, format, **options)
+        return data.getvalue()
+
+    return {
+        'favicon-16.png': encode(drawing(16), 'PNG'),
+        'favicon.ico': encode(drawing(256), 'ICO', sizes=[(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]),
+        'apple-touch-180.png': encode(drawing(180), 'PNG'),
+        'palette-64.gif': encode(drawing(64).convert('P'), 'GIF'),
+        'logo-1024.png': encode(drawing(1024), 'PNG'),
+        'photo-2048.jpg': encode(drawing(2048, 'RGB'), 'JPEG', quality=85),
+    }
+
+def legacy_pipeline(data):
+    # the pipeline as it was before: pad at full size, convert twice, scale in wx, then copy out to RGBA
+    import wx
+    pil_image = Image.open(BytesIO(data))
+    pil_image.load()
+    if pil_image.mode != 'RGBA':
+        pil_image = pil_image.convert('RGBA')
+    pil_image_with_margin = ImageOps.expand(pil_image, border=10, fill=(0, 0, 0, 0))
+    wx_image = wx.Image(pil_image_with_margin.size[0], pil_image_with_margin.size[1])
+    wx_image.SetData(pil_image_with_margin.convert('RGB').tobytes())
+    wx_image.SetAlpha(pil_image_with_margin.convert('RGBA').tobytes()[3::4])
+    image = wx_image.Scale(58, 58, wx.IMAGE_QUALITY_HIGH)
+
+    rgba = bytearray(image.GetWidth() * image.GetHeight() * 4)
+    rgb = bytes(image.GetData())
+    rgba[0::4] = rgb[0::3]
+    rgba[1::4] = rgb[1::3]
+    rgba[2::4] = rgb[2::3]
+    rgba[3::4] = bytes(image.GetAlpha())
+    return bytes(rgba)
+
+def current_pipeline(data):
+    from icon_processing import IconProcessing
+    return IconProcessing.load_and_pad_image_rgba(BytesIO(data))
+
+PIPELINES = {'legacy': legacy_pipeline, 'current': current_pipeline}
+
+def peak_memory_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes everywhere else
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def run_pipeline(name, iterations, samples_dir):
+    pipeline = PIPELINES[name]
+    # the samples are made by the parent process, so making them doesn't count towards this one's peak memory
+    icons = {}
+    for icon_name in sorted(os.listdir(samples_dir)):
+        with open(os.path.join(samples_dir, icon_name), 'rb') as icon_file:
+            icons[icon_name] = icon_file.read()
+    # warm up on the smallest icon so imports aren't counted, but the big icons' memory use is
+    pipeline(icons['favicon-16.png'])
+    baseline = peak_memory_kb()
+
+    results = {}
+    for icon_name, data in icons.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            pipeline(data)
+        elapsed = time.perf_counter() - start
+        results[icon_name] = {'icons_per_second': iterations / elapsed, 'mean_ms': elapsed / iterations * 1000}
+
+    peak = peak_memory_kb()
+    return {'pipeline': name, 'icons': results,
+            'peak_memory_growth_kb': peak - baseline if peak is not None else None}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the old and new icon pipelines')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--pipeline', choices=PIPELINES, help=argparse.SUPPRESS)
+    parser.add_argument('--samples', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.pipeline:
+        print(json.dumps(run_pipeline(args.pipeline, args.iterations, args.samples)))
+        return
+
+    runs = {}
+    with tempfile.TemporaryDirectory() as samples_dir:
+        for icon_name, data in sample_icons().items():
+            with open(os.path.join(samples_dir, icon_name), 'wb') as icon_file:
+                icon_file.write(data)
+        for name in PIPELINES:
+            output = subprocess.run([sys.executable, __file__, '--pipeline', name, '--iterations', str(args.iterations),
+                                     '--samples', samples_dir], check=True, capture_output=True, text=True).stdout
+            runs[name] = json.loads(output.splitlines()[-1])
+
+    print(f"{'icon':<22}{'legacy ms':>12}{'current ms':>12}{'speedup':>10}")
+    for icon_name, legacy in runs['legacy']['icons'].items():
+        current = runs['current']['icons'][icon_name]
+        print(f"{icon_name:<22}{legacy['mean_ms']:>12.2f}{current['mean_ms']:>12.2f}"
+              f"{legacy['mean_ms'] / current['mean_ms']:>9.1f}x")
+    for name, run in runs.items():
+        if run['peak_memory_growth_kb'] is not None:
+            print(f"{name} peak memory growth: {run['peak_memory_growth_kb']}KB")
+
+if __name__ == '__main__':
+    main()
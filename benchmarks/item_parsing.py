@@ -0,0 +1,87 @@
+# Compares parsing a large /api/items response with response.json() against streaming it into compact rows,
+# as Yaffle does now: peak memory, total time, and how much of the body has to arrive before the first row is
+# ready. Yarr's pages are small, so this uses a much bigger list (with content, as a worst case) to show how
+# each approach scales.
+#
+#   poetry run python benchmarks/item_parsing.py [--items 5000 --content-bytes 8000]
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from json_stream import parse_list_response
+
+CHUNK_SIZE = 16 * 1024 # the same as YarrClient
+
+class Row:
+    # the shape of item_list.ItemRow, without importing wx
+    __slots__ = ('id', 'feed_id', 'title', 'link', 'date', 'status')
+
+    def __init__(self, item):
+        self.id = item['id']
+        self.feed_id = item['feed_id']
+        self.title = item.get('title')
+        self.link = item.get('link')
+        self.date = item.get('date')
+        self.status = item.get('status')
+
+def make_body(item_count, content_bytes):
+    paragraph = '<p>Some of the article, with <a href="https://example.com">a link</a>.</p>'
+    content = paragraph * max(1, content_bytes // len(paragraph))
+    items = [{'id': item_id, 'feed_id': item_id % 100, 'title': f"Item {item_id}", 'link': f"https://example.com/{item_id}",
+              'date': '2024-01-01T00:00:00Z', 'status': 'unread', 'content': content}
+             for item_id in range(item_count, 0, -1)]
+    return json.dumps({'has_more': False, 'list': items}).encode('utf-8')
+
+def chunks(body, progress):
+    for start in range(0, len(body), CHUNK_SIZE):
+        progress['bytes'] = start + CHUNK_SIZE
+        yield body[start:start + CHUNK_SIZE]
+
+def parse_whole(body):
+    # what response.json() does: decode the whole body, parse it all, then make the rows
+    data = json.loads(b''.join(chunks(body, {})).decode('utf-8'))
+    data['list'] = [Row(item) for item in data['list']]
+    return data, len(body)
+
+def parse_streamed(body):
+    progress = {'bytes': 0}
+    first_row_bytes = []
+
+    def make_row(item):
+        if not first_row_bytes:
+            first_row_bytes.append(min(progress['bytes'], len(body)))
+        return Row(item)
+    return parse_list_response(chunks(body, progress), 'list', make_row), first_row_bytes[0]
+
+def measure(parse, body):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data, first_row_bytes = parse(body)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert len(data['list']) > 0
+    return elapsed, peak, first_row_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare whole-body and streamed parsing of item lists')
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--content-bytes', type=int, default=8000)
+    args = parser.parse_args()
+
+    body = make_body(args.items, args.content_bytes)
+    print(f"{args.items} items, {len(body) // 1024}KB body")
+    for name, parse in (('response.json()', parse_whole), ('streamed rows', parse_streamed)):
+        elapsed, peak, first_row_bytes = measure(parse, body)
+        print(f"{name}: {elapsed * 1000:.0f}ms, peak {peak // 1024}KB above the body, "
+              f"first row after {first_row_bytes // 1024}KB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+# Runs Yaffle against the fake Yarr server and measures the things a user waits for: startup (cold, and warm
+# from the snapshot), switching feeds, opening articles and loading feed icons. Results are written as JSON so
+# runs can be compared between commits.
+#
+#   poetry run python benchmarks/run.py [--feeds 500 --latency-ms 20 ...] [--compare benchmarks/results/old.json]
+#
+# On Linux without a display it re-runs itself under xvfb-run, so it works on a headless machine or in CI.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import fake_yarr
+
+POLL_MS = 1
+TIMEOUT = 60 # seconds to wait for any one step before giving up
+
+def ensure_display():
+    if not sys.platform.startswith('linux') or os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'):
+        return
+    if os.environ.get('YAFFLE_BENCHMARK_XVFB'):
+        sys.exit("xvfb-run didn't provide a display")
+    if shutil.which('xvfb-run') is None:
+        sys.exit("No display: install Xvfb (xvfb-run) to run the benchmarks headlessly")
+    os.environ['YAFFLE_BENCHMARK_XVFB'] = '1'
+    os.execvp('xvfb-run', ['xvfb-run', '-a', '-s', '-screen 0 1280x1024x24', sys.executable] + sys.argv)
+
+def summarise(samples_ms):
+    ordered = sorted(samples_ms)
+    return {'samples': len(ordered), 'median_ms': statistics.median(ordered),
+            'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            'min_ms': ordered[0], 'max_ms': ordered[-1]}
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def icon_throughput(fake, iterations):
+    # processing alone, away from the UI and the network
+    from icon_processing import IconProcessing
+    start = time.perf_counter()
+    count = 0
+    for _ in range(iterations):
+        for icon in fake.icons:
+            IconProcessing.load_and_pad_image_rgba(BytesIO(icon))
+            count += 1
+    return count / (time.perf_counter() - start)
+
+class Scenario:
+    # Steps through the benchmark inside the wx main loop, so the app behaves as it does for real: each step
+    # yields a condition, and a timer moves on to the next step once it's true.
+
+    def __init__(self, app, frame_class, args, fake):
+        import wx
+        self.app = app
+        self.frame_class = frame_class
+        self.args = args
+        self.fake = fake
+        self.metrics = {}
+        self.error = None
+        self.steps = self.run()
+        self.waiting_for = None
+        self.deadline = None
+        # keeps the main loop alive while frames are closed and reopened
+        self.keep_alive = wx.Frame(None)
+        self.timer = wx.Timer()
+        self.timer.Bind(wx.EVT_TIMER, self.on_timer)
+
+    def start(self):
+        self.advance()
+        self.timer.Start(POLL_MS)
+
+    def on_timer(self, event):
+        if self.waiting_for is not None and not self.waiting_for():
+            if time.perf_counter() > self.deadline:
+                self.finish(TimeoutError(f"step {self.waiting_for.__name__} didn't finish within {TIMEOUT}s"))
+            return
+        self.advance()
+
+    def advance(self):
+        try:
+            self.waiting_for = next(self.steps)
+            self.deadline = time.perf_counter() + TIMEOUT
+        except StopIteration:
+            self.finish(None)
+        except Exception as e:
+            self.finish(e)
+
+    def finish(self, error):
+        self.error = error
+        self.timer.Stop()
+        self.keep_alive.Destroy()
+        self.app.ExitMainLoop()
+
+    def record(self, name, value):
+        self.metrics.setdefault(name, []).append(value)
+
+    def run(self):
+        feed_count = len(self.fake.feeds)
+        icon_count = sum(1 for feed in self.fake.feeds if feed['has_icon'])
+
+        for run in range(self.args.startups):
+            # the first start has nothing on disk; the rest start from the snapshot and icon cache
+            kind = 'cold' if run == 0 else 'warm'
+            start = time.perf_counter()
+            frame = self.frame_class()
+            frame.Show()
+            self.record(f"startup_{kind}_frame_ms", (time.perf_counter() - start) * 1000)
+
+            def tree_populated():
+                return len(frame.feed_tree_items) == feed_count
+            yield tree_populated
+            self.record(f"startup_{kind}_tree_ms", (time.perf_counter() - start) * 1000)
+
+            if kind == 'cold':
+                def icons_loaded():
+                    return len(frame.icons_set) >= icon_count
+                yield icons_loaded
+                self.record('icons_loaded_ms', (time.perf_counter() - start) * 1000)
+                self.record('icons_per_second_end_to_end', icon_count / (time.perf_counter() - start))
+
+            if run < self.args.startups - 1:
+                frame.Close()
+
+        # switching feeds: time until the first page of the new feed is in the list
+        feed_ids = [feed['id'] for feed in self.fake.feeds][::max(1, feed_count // self.args.feed_switches)]
+        for feed_id in feed_ids[:self.args.feed_switches]:
+            start = time.perf_counter()
+            frame.pages_loaded.clear()
+            frame.populate_item_list(feed_id)
+
+            def first_page_loaded():
+                return 0 in frame.pages_loaded
+            yield first_page_loaded
+            self.record('feed_switch_ms', (time.perf_counter() - start) * 1000)
+
+        # opening articles one after another, the way people read; later ones may already be prefetched
+        for index in range(self.args.article_opens):
+            item = frame.item_list.loader.peek(index)
+            if item is None:
+                break
+            start = time.perf_counter()
+            frame.on_feed_item_selected(ListEvent(index))
+
+            def article_shown():
+                return item.id in frame.items_shown
+            yield article_shown
+            self.record('article_open_first_ms' if index == 0 else 'article_open_ms',
+                        (time.perf_counter() - start) * 1000)
+
+        # the "All unread" river, merged across every feed by the server
+        for _ in range(self.args.feed_switches):
+            start = time.perf_counter()
+            frame.pages_loaded.clear()
+            frame.populate_river()
+
+            def first_river_page_loaded():
+                return 0 in frame.pages_loaded
+            yield first_river_page_loaded
+            self.record('river_first_page_ms', (time.perf_counter() - start) * 1000)
+
+        frame.Close()
+
+class ListEvent:
+    # stands in for the wx.ListEvent from clicking on a row
+    def __init__(self, index):
+        self.index = index
+
+    def GetIndex(self):
+        return self.index
+
+def benchmark_frame_class(yaffle):
+    class BenchmarkFrame(yaffle.YaffleFrame):
+        # records when things reach the screen, without changing what the app does
+
+        def __init__(self):
+            self.icons_set = set()
+            self.pages_loaded = set()
+            self.items_shown = set()
+            super().__init__()
+
+        def set_feed_icon(self, feed_id, rgba):
+            super().set_feed_icon(feed_id, rgba)
+            self.icons_set.add(feed_id)
+
+        def on_item_page_loaded(self, page_number, items):
+            super().on_item_page_loaded(page_number, items)
+            self.pages_loaded.add(page_number)
+
+        def show_item(self, item_id, item_index, item_title, data):
+            super().show_item(item_id, item_index, item_title, data)
+            self.items_shown.add(item_id)
+
+    return BenchmarkFrame
+
+def compare(results, previous_file):
+    with open(previous_file, 'r', encoding='utf-8') as previous:
+        previous_metrics = json.load(previous)['metrics']
+    print(f"\nCompared with {previous_file}:")
+    for name, metric in results['metrics'].items():
+        if name in previous_metrics:
+            key = 'median_ms' if 'median_ms' in metric else 'value'
+            before, after = previous_metrics[name][key], metric[key]
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"  {name}: {before:.1f} -> {after:.1f} ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Yaffle against a fake Yarr server')
+    fake_yarr.add_arguments(parser)
+    parser.add_argument('--startups', type=int, default=3, help='one cold start, then warm starts')
+    parser.add_argument('--feed-switches', type=int, default=20)
+    parser.add_argument('--article-opens', type=int, default=20)
+    parser.add_argument('--icon-iterations', type=int, default=20)
+    parser.add_argument('--output', help='where to write the JSON results (default: benchmarks/results/)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+    ensure_display()
+
+    fake = fake_yarr.from_arguments(args).start()
+    commit, dirty = git_revision()
+    work_dir = tempfile.mkdtemp(prefix='yaffle-benchmark-')
+    try:
+        # Yaffle keeps its config, caches and snapshot in the working directory, so each run starts clean
+        os.chdir(work_dir)
+        with open('yaffle.ini', 'w', encoding='utf-8') as config_file:
+            config_file.write(f"[Yaffle]\nYARR_URL = {fake.url}\nselected_feed = 0\nrefresh_interval = 0\n")
+
+        import wx
+        import yaffle
+        app = wx.App(False)
+        scenario = Scenario(app, benchmark_frame_class(yaffle), args, fake)
+        wx.CallAfter(scenario.start)
+        app.MainLoop()
+        if scenario.error is not None:
+            raise scenario.error
+
+        metrics = {}
+        for name, samples in scenario.metrics.items():
+            metrics[name] = {'value': samples[0]} if name.endswith('per_second_end_to_end') else summarise(samples)
+        metrics['icon_processing_per_second'] = {'value': icon_throughput(fake, args.icon_iterations)}
+        results = {
+            'commit': commit,
+            'dirty': dirty,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'wx': wx.version(),
+            'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+            'requests_served': fake.requests,
+            'metrics': metrics,
+        }
+    finally:
+        os.chdir(REPO_DIR)
+        fake.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(os.path.join(BENCHMARKS_DIR, 'results'), exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        output = os.path.join(BENCHMARKS_DIR, 'results', f"{stamp}-{(commit or 'unknown')[:10]}.json")
+    with open(output, 'w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=2)
+
+    for name, metric in metrics.items():
+        if 'median_ms' in metric:
+            print(f"{name}: median {metric['median_ms']:.1f}ms, p95 {metric['p95_ms']:.1f}ms ({metric['samples']} samples)")
+        else:
+            print(f"{name}: {metric['value']:.1f}")
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
 import sys
 import configparser
+import json
+import os
+
+SNAPSHOT_FILE = 'yaffle-snapshot.json'
 
 def load_config():
     config = configparser.ConfigParser()
@@ -27,7 +31,11 @@ def save_config(frame):
         config = configparser.ConfigParser()
         config.read('yaffle.ini')
         if frame.feed_tree is not None:
-            config['Yaffle']['selected_feed'] = str(frame.feed_tree.GetItemData(frame.feed_tree.GetSelection()))
+            selected_feed = frame.get_selected_feed()
+            if selected_feed is not None:
+                config['Yaffle']['selected_feed'] = str(selected_feed.id)
+
+        config['Yaffle']['show_unread_only'] = str(frame.show_unread_only)
 
         width, height = frame.GetSize()
         config['Yaffle']['dimensions'] = f"{width}x{height}"
@@ -40,3 +48,42 @@ def save_config(frame):
     except (configparser.Error, IOError) as e:
         print(f"Failed to save state: {e}")
         return
+
+def load_snapshot():
+    # the folder/feed tree as it was when the app was last closed, so it can be drawn before Yarr has answered
+    try:
+        with open(SNAPSHOT_FILE, 'r', encoding='utf-8') as snapshot_file:
+            return json.load(snapshot_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Failed to load snapshot: {e}")
+        return None
+
+def save_snapshot(frame):
+    selected_feed = frame.get_selected_feed()
+    write_snapshot(frame.model, selected_feed.id if selected_feed is not None else None)
+
+def write_snapshot(model, selected_feed_id=None):
+    try:
+        # same shape as the /api/folders, /api/feeds and /api/status responses, and in the same order
+        folders = model.sorted_folders()
+        feeds = sorted(model.feeds.values(), key=lambda feed: feed.title.lower())
+        snapshot = {
+            'folders': [{'id': folder.id, 'title': folder.title} for folder in folders],
+            'feeds': [{'id': feed.id, 'folder_id': feed.folder_id or None, 'title': feed.title, 'has_icon': feed.has_icon}
+                      for feed in feeds],
+            'stats': [{'feed_id': feed.id, 'unread': feed.unread} for feed in feeds if feed.unread > 0],
+        }
+        if selected_feed_id is not None:
+            snapshot['selected_feed'] = selected_feed_id
+
+        # the app and `yaffle sync` both write this, so write then rename, to a temp file of our own, so a reader
+        # never sees half a snapshot
+        temp_path = f"{SNAPSHOT_FILE}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(',', ':'))
+        os.replace(temp_path, SNAPSHOT_FILE)
+    except (OSError, TypeError) as e:
+        print(f"Failed to save snapshot: {e}")
+        return
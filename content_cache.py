@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+
+from worker_pool import WorkerPool
+
+class ContentCache:
+
+    MAX_SIZE_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, max_size_bytes=MAX_SIZE_BYTES):
+        self.max_size_bytes = max_size_bytes
+        # item ID -> (item data from /api/items/{id}, approximate size), in least recently used order
+        self.items = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # filled from the prefetcher's worker threads as well as the main thread
+        self.lock = threading.Lock()
+
+    def get(self, item_id):
+        with self.lock:
+            entry = self.items.get(item_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.items.move_to_end(item_id)
+            return entry[0]
+
+    def __contains__(self, item_id):
+        # doesn't count as a hit or a miss, so the prefetcher can check without skewing the stats
+        with self.lock:
+            return item_id in self.items
+
+    def put(self, item_id, data):
+        size = sum(len(value) for value in data.values() if isinstance(value, str))
+        with self.lock:
+            previous = self.items.pop(item_id, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+            self.items[item_id] = (data, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_size_bytes and len(self.items) > 1:
+                _, (_, evicted_size) = self.items.popitem(last=False)
+                self.size_bytes -= evicted_size
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'items': len(self.items), 'size_bytes': self.size_bytes}
+
+class ContentPrefetcher:
+
+    # a couple of workers is plenty, and leaves the connection pool free for the things the user asked for
+    MAX_WORKERS = 2
+
+    def __init__(self, fetch_item, content_cache, max_workers=MAX_WORKERS):
+        # fetch_item(item_id) gets an item from Yarr and puts it in the cache (and anywhere else it should go)
+        self.fetch_item = fetch_item
+        self.content_cache = content_cache
+        self.executor = WorkerPool(max_workers, thread_name_prefix='prefetch')
+        self.in_flight = set()
+        self.lock = threading.Lock()
+
+    def prefetch(self, item_ids):
+        for item_id in item_ids:
+            with self.lock:
+                if item_id in self.in_flight or item_id in self.content_cache:
+                    continue
+                self.in_flight.add(item_id)
+            self.executor.submit(self.fetch, item_id)
+
+    def fetch(self, item_id):
+        import requests
+        try:
+            self.fetch_item(item_id)
+        except requests.RequestException as e:
+            print(f"Failed to prefetch item {item_id}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard(item_id)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,213 @@
+class Folder:
+
+    def __init__(self, id, title):
+        self.id = id
+        self.title = title
+        self.unread = 0 # sum of the unread counts of the feeds in this folder
+        self.feed_ids = set()
+
+class Feed:
+
+    def __init__(self, id, folder_id, title, has_icon):
+        self.id = id
+        self.folder_id = folder_id # 0 for feeds that aren't in a folder
+        self.title = title
+        self.has_icon = has_icon
+        self.unread = 0
+
+class River:
+
+    # the "All unread" node at the top of the tree: unread items from every feed, newest first. Selecting a
+    # folder shows the same kind of list for just that folder's feeds.
+    def __init__(self, model):
+        self.model = model
+        self.title = 'All unread'
+
+    @property
+    def unread(self):
+        return sum(folder.unread for folder in self.model.folders.values())
+
+class Item:
+
+    # one of these is kept for every item listed in a session, so keep them small
+    __slots__ = ('id', 'feed_id', 'status')
+
+    def __init__(self, id, feed_id, status):
+        self.id = id
+        self.feed_id = feed_id
+        self.status = status
+
+class ModelChanges:
+
+    def __init__(self):
+        self.added_folders = []
+        self.removed_folders = []
+        self.added_feeds = []
+        self.removed_feeds = []
+        self.moved_feeds = []
+        self.changed_icons = []
+        # feeds and folders whose label (title or unread count) needs redrawing
+        self.changed_nodes = set()
+
+    def is_empty(self):
+        return not (self.added_folders or self.removed_folders or self.added_feeds or self.removed_feeds or
+                    self.moved_feeds or self.changed_icons or self.changed_nodes)
+
+class FeedModel:
+
+    # the pseudo-folder that holds feeds which aren't in a folder, shown at the root of the tree
+    ROOT_FOLDER_ID = 0
+
+    def __init__(self):
+        # everything is indexed by the ID Yarr gives it, so lookups and count updates are O(1)
+        self.folders = {}
+        self.feeds = {}
+        self.items = {}
+        self.river = River(self)
+
+    def load(self, folder_data, feed_data, status_data):
+        self.folders = {self.ROOT_FOLDER_ID: Folder(self.ROOT_FOLDER_ID, '')}
+        self.feeds = {}
+        self.items = {}
+        return self.update(folder_data, feed_data, status_data)
+
+    def update(self, folder_data, feed_data, status_data):
+        # bring the model in line with fresh /api/folders, /api/feeds and /api/status responses, changing
+        # existing Folder and Feed objects in place and returning what changed so views can update just that
+        changes = ModelChanges()
+
+        folder_ids = {self.ROOT_FOLDER_ID}
+        for folder_json in folder_data:
+            folder_ids.add(folder_json['id'])
+            folder = self.folders.get(folder_json['id'])
+            if folder is None:
+                folder = Folder(folder_json['id'], folder_json['title'])
+                self.folders[folder.id] = folder
+                changes.added_folders.append(folder)
+            elif folder.title != folder_json['title']:
+                folder.title = folder_json['title']
+                changes.changed_nodes.add(folder)
+
+        feed_ids = set()
+        for feed_json in feed_data:
+            feed_ids.add(feed_json['id'])
+            folder_id = feed_json['folder_id'] if feed_json['folder_id'] is not None else self.ROOT_FOLDER_ID
+            title = str(feed_json['title']).strip()
+            has_icon = feed_json['has_icon'] is True
+
+            feed = self.feeds.get(feed_json['id'])
+            if feed is None:
+                self.add_feed(Feed(feed_json['id'], folder_id, title, has_icon))
+                changes.added_feeds.append(self.feeds[feed_json['id']])
+                continue
+
+            if feed.folder_id != folder_id:
+                self.move_feed(feed, folder_id, changes)
+            if feed.title != title:
+                feed.title = title
+                changes.changed_nodes.add(feed)
+            if feed.has_icon != has_icon:
+                feed.has_icon = has_icon
+                changes.changed_icons.append(feed)
+
+        for feed_id in [feed_id for feed_id in self.feeds if feed_id not in feed_ids]:
+            feed = self.feeds[feed_id]
+            self.set_feed_unread(feed_id, 0)
+            self.folders[feed.folder_id].feed_ids.discard(feed_id)
+            changes.changed_nodes.add(self.folders[feed.folder_id])
+            del self.feeds[feed_id]
+            changes.removed_feeds.append(feed)
+
+        # feeds have all been moved out of removed folders by now
+        for folder_id in [folder_id for folder_id in self.folders if folder_id not in folder_ids]:
+            changes.removed_folders.append(self.folders.pop(folder_id))
+
+        unread_counts = {stats['feed_id']: stats['unread'] for stats in status_data['stats']}
+        for feed in self.feeds.values():
+            unread = unread_counts.get(feed.id, 0)
+            if feed.unread != unread:
+                self.set_feed_unread(feed.id, unread)
+                changes.changed_nodes.add(feed)
+                changes.changed_nodes.add(self.folders[feed.folder_id])
+
+        return changes
+
+    def move_feed(self, feed, folder_id, changes):
+        old_folder = self.folders[feed.folder_id]
+        old_folder.feed_ids.discard(feed.id)
+        old_folder.unread -= feed.unread
+        new_folder = self.folders[folder_id]
+        new_folder.feed_ids.add(feed.id)
+        new_folder.unread += feed.unread
+        feed.folder_id = folder_id
+        changes.moved_feeds.append(feed)
+        changes.changed_nodes.update((old_folder, new_folder))
+
+    def sorted_folders(self):
+        # the order Yarr lists them in, which is also the order they appear in the tree
+        return sorted((folder for folder in self.folders.values() if folder.id != self.ROOT_FOLDER_ID),
+                      key=lambda folder: folder.title.lower())
+
+    def sorted_feeds(self, folder):
+        return sorted((self.feeds[feed_id] for feed_id in folder.feed_ids), key=lambda feed: feed.title.lower())
+
+    def add_feed(self, feed):
+        self.feeds[feed.id] = feed
+        self.folders[feed.folder_id].feed_ids.add(feed.id)
+
+    def folder_for_feed(self, feed_id):
+        return self.folders[self.feeds[feed_id].folder_id]
+
+    def set_feed_unread(self, feed_id, unread):
+        feed = self.feeds.get(feed_id)
+        if feed is None:
+            return
+        self.folder_for_feed(feed_id).unread += unread - feed.unread
+        feed.unread = unread
+
+    def mark_feeds_read(self, feed_ids):
+        # marks everything in these feeds as read locally, and returns the feeds whose unread count changed
+        changed_feeds = []
+        for feed_id in feed_ids:
+            feed = self.feeds.get(feed_id)
+            if feed is not None and feed.unread > 0:
+                self.set_feed_unread(feed_id, 0)
+                changed_feeds.append(feed)
+        for item in self.items.values():
+            if item.feed_id in feed_ids:
+                item.status = 'read'
+        return changed_feeds
+
+    def mark_read_groups(self, feed_ids):
+        # the fewest Yarr calls that mark these feeds as read: one for each folder whose feeds are all
+        # included, and one for each feed left over. Returns a list of ('folder' or 'feed', id, feed IDs covered).
+        remaining = set(feed_ids)
+        groups = []
+        for folder in self.folders.values():
+            # feeds at the root aren't in a folder as far as Yarr is concerned
+            if folder.id != self.ROOT_FOLDER_ID and folder.feed_ids and folder.feed_ids <= remaining:
+                groups.append(('folder', folder.id, set(folder.feed_ids)))
+                remaining -= folder.feed_ids
+        groups.extend(('feed', feed_id, {feed_id}) for feed_id in sorted(remaining))
+        return groups
+
+    def set_items(self, items):
+        # remember the read state of items (the item list's rows) as they are listed, so marking one read can
+        # update the counts
+        for item in items:
+            self.items[item.id] = Item(item.id, item.feed_id, item.status)
+
+    def set_item_status(self, item_id, status):
+        # returns the affected feed so the caller can refresh just that tree node, or None if nothing changed
+        item = self.items.get(item_id)
+        if item is None or item.status == status:
+            return None
+        change = (status == 'unread') - (item.status == 'unread')
+        item.status = status
+
+        feed = self.feeds.get(item.feed_id)
+        if feed is None or change == 0:
+            return None
+        # the unread count from /api/status can be stale, so never let it go negative
+        self.set_feed_unread(feed.id, max(0, feed.unread + change))
+        return feed
@@ -0,0 +1,46 @@
+import os
+import sys
+
+class FileLock:
+
+    # An advisory lock on a file, held by one process at a time. The operating system lets it go when the
+    # process exits, so a crashed sync never leaves a stale lock behind.
+    def __init__(self, path):
+        self.path = path
+        self.lock_file = None
+
+    def acquire(self):
+        # returns False straight away if another process holds the lock
+        lock_file = open(self.path, 'a+b')
+        try:
+            if sys.platform == 'win32':
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        # for anyone wondering who holds it
+        lock_file.truncate(0)
+        lock_file.write(str(os.getpid()).encode('ascii'))
+        lock_file.flush()
+        return True
+
+    def release(self):
+        if self.lock_file is None:
+            return
+        try:
+            if sys.platform == 'win32':
+                import msvcrt
+                self.lock_file.seek(0)
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.lock_file.close()
+            self.lock_file = None
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+
+from icon_processing import IconProcessing
+
+class IconCache:
+
+    CACHE_DIR = 'icon_cache'
+    INDEX_FILE = 'index.json'
+    MAX_SIZE_BYTES = 16 * 1024 * 1024 # roughly 1200 padded icons
+    ICON_BYTES = IconProcessing.ICON_SIZE[0] * IconProcessing.ICON_SIZE[1] * 4
+    # files younger than this may belong to another process (the app or `yaffle sync`) that hasn't saved its
+    # index yet, so they aren't treated as orphans
+    ORPHAN_AGE = 60 * 60 # seconds
+
+    def __init__(self, cache_dir=CACHE_DIR, max_size_bytes=MAX_SIZE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        # the icon loader writes to the cache from its worker threads
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index = self.load_index()
+        # whether icons have been added since the index was last saved
+        self.changed = False
+        self.remove_orphans()
+
+    def load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE), 'r', encoding='utf-8') as index_file:
+                # JSON object keys are always strings, the rest of the app uses int feed IDs
+                return {int(feed_id): entry for feed_id, entry in json.load(index_file).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Starting with an empty icon cache: {e}")
+            return {}
+
+    def remove_orphans(self):
+        # icons written after the index was last saved (e.g. if we crashed) aren't in it, so tidy them up, along
+        # with temp files left by a crash mid-write
+        try:
+            file_names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        cutoff = time.time() - self.ORPHAN_AGE
+        for file_name in file_names:
+            feed_id, extension = os.path.splitext(file_name)
+            if file_name == self.INDEX_FILE or (extension == '.rgba' and feed_id.isdigit() and int(feed_id) in self.index):
+                continue
+            try:
+                if os.path.getmtime(os.path.join(self.cache_dir, file_name)) < cutoff:
+                    os.remove(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                pass
+
+    def icon_path(self, feed_id):
+        return os.path.join(self.cache_dir, f"{feed_id}.rgba")
+
+    def get(self, feed_id):
+        # returns the cached 58x58 RGBA pixels for the feed, ready to be turned into a bitmap
+        with self.lock:
+            entry = self.index.get(feed_id)
+            if entry is None:
+                return None
+            try:
+                with open(self.icon_path(feed_id), 'rb') as icon_file:
+                    rgba = icon_file.read()
+            except OSError:
+                del self.index[feed_id]
+                return None
+            if len(rgba) != self.ICON_BYTES:
+                del self.index[feed_id]
+                return None
+            entry['last_used'] = time.time()
+            return rgba
+
+    def validators(self, feed_id):
+        # conditional request headers so the server can answer 304 Not Modified for icons we already have
+        with self.lock:
+            entry = self.index.get(feed_id)
+            headers = {}
+            if entry is not None:
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+    def touch(self, feed_id):
+        with self.lock:
+            if feed_id in self.index:
+                self.index[feed_id]['last_used'] = time.time()
+
+    def has_source(self, feed_id, source_hash):
+        with self.lock:
+            entry = self.index.get(feed_id)
+            return entry is not None and entry.get('source_hash') == source_hash
+
+    def put(self, feed_id, rgba, etag=None, last_modified=None, source_hash=None):
+        with self.lock:
+            try:
+                # write then rename so a crash can never leave a half-written icon behind. The temp file is this
+                # process's own, as the app and `yaffle sync` may be writing the same icon at once.
+                temp_path = f"{self.icon_path(feed_id)}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as icon_file:
+                    icon_file.write(rgba)
+                os.replace(temp_path, self.icon_path(feed_id))
+            except OSError as e:
+                print(f"Failed to cache icon for feed {feed_id}: {e}")
+                return
+            self.index[feed_id] = {'etag': etag, 'last_modified': last_modified, 'source_hash': source_hash,
+                                   'last_used': time.time()}
+            self.changed = True
+
+    def evict_unsubscribed(self, feed_ids):
+        with self.lock:
+            for feed_id in [feed_id for feed_id in self.index if feed_id not in feed_ids]:
+                self.remove(feed_id)
+
+    def enforce_size_cap(self):
+        # every entry is the same size, so the cap is just a maximum number of icons
+        max_entries = self.max_size_bytes // self.ICON_BYTES
+        with self.lock:
+            if len(self.index) <= max_entries:
+                return
+            least_recently_used = sorted(self.index, key=lambda feed_id: self.index[feed_id]['last_used'])
+            for feed_id in least_recently_used[:len(self.index) - max_entries]:
+                self.remove(feed_id)
+
+    def merge_saved_index(self):
+        # callers must hold the lock. The app and `yaffle sync` can both have the cache open, so keep anything
+        # the other one has saved since we loaded the index, as long as its icon is still there.
+        for feed_id, entry in self.load_index().items():
+            current = self.index.get(feed_id)
+            if current is None and not os.path.exists(self.icon_path(feed_id)):
+                continue
+            if current is None or entry.get('last_used', 0) > current.get('last_used', 0):
+                self.index[feed_id] = entry
+
+    def remove(self, feed_id):
+        # callers must hold the lock
+        self.index.pop(feed_id, None)
+        try:
+            os.remove(self.icon_path(feed_id))
+        except OSError:
+            pass
+
+    def save_if_changed(self):
+        # another process opening the cache treats icons missing from the saved index as orphans once they're
+        # ORPHAN_AGE old, so the index is saved after each batch of icons rather than only on exit
+        with self.lock:
+            changed = self.changed
+        if changed:
+            self.save()
+
+    def save(self):
+        self.enforce_size_cap()
+        with self.lock:
+            self.changed = False
+            self.merge_saved_index()
+            try:
+                temp_path = os.path.join(self.cache_dir, f"{self.INDEX_FILE}.{os.getpid()}.tmp")
+                with open(temp_path, 'w', encoding='utf-8') as index_file:
+                    json.dump(self.index, index_file)
+                os.replace(temp_path, os.path.join(self.cache_dir, self.INDEX_FILE))
+            except OSError as e:
+                print(f"Failed to save icon cache: {e}")
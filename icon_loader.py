@@ -0,0 +1,78 @@
+import hashlib
+import threading
+from io import BytesIO
+
+from icon_processing import IconProcessing
+from tracing import Tracer
+from worker_pool import WorkerPool
+
+class IconLoader:
+
+    MAX_WORKERS = 8
+
+    def __init__(self, yarr_client, icon_cache, on_icon_loaded, tracer=None, max_workers=MAX_WORKERS):
+        # the client's session is pooled, so icon requests reuse keep-alive connections instead of each
+        # paying for a new TCP handshake
+        self.yarr_client = yarr_client
+        self.icon_cache = icon_cache
+        # called on the main thread with (feed_id, rgba) when an icon is new or has changed on the server
+        self.on_icon_loaded = on_icon_loaded
+        self.tracer = tracer if tracer is not None else Tracer()
+
+        self.executor = WorkerPool(max_workers, thread_name_prefix='icon-loader')
+        # icons queued or being fetched; the cache's index is saved each time this drops to zero
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def load(self, feed_id):
+        with self.lock:
+            self.pending += 1
+        self.executor.submit(self.fetch_icon, feed_id)
+
+    def fetch_icon(self, feed_id):
+        import wx
+        try:
+            rgba = self.update_icon(feed_id)
+        finally:
+            with self.lock:
+                self.pending -= 1
+                idle = self.pending == 0
+            if idle:
+                self.icon_cache.save_if_changed()
+        if rgba is not None:
+            wx.CallAfter(self.on_icon_loaded, feed_id, rgba)
+
+    def update_icon(self, feed_id):
+        # brings the cached icon up to date, returning the new pixels if they changed. Doesn't need wx, so
+        # `yaffle sync` uses this too.
+        import requests
+        try:
+            icon_response = self.yarr_client.get_feed_icon(feed_id, headers=self.icon_cache.validators(feed_id))
+        except requests.RequestException as e:
+            print(f"Failed to fetch icon for feed {feed_id}: {e}")
+            return None
+
+        # the cached copy is still current, so there is nothing to download or process
+        if icon_response.status_code == 304:
+            self.icon_cache.touch(feed_id)
+            return None
+
+        if 'image' not in icon_response.headers.get('Content-Type', ''):
+            print(f"C Failed to load image for feed {feed_id}. Unknown image data format.")
+            return None
+
+        # servers that don't send validators still give us the same bytes, so skip the processing if they match
+        source_hash = hashlib.sha1(icon_response.content).hexdigest()
+        if self.icon_cache.has_source(feed_id, source_hash):
+            self.icon_cache.touch(feed_id)
+            return None
+
+        # decoding and padding happen here on the worker thread, only the bitmap is created on the UI thread
+        with self.tracer.span('icon processing', bytes=len(icon_response.content)):
+            rgba = IconProcessing.load_and_pad_image_rgba(BytesIO(icon_response.content))
+        if rgba is not None:
+            self.icon_cache.put(feed_id, rgba, icon_response.headers.get('ETag'), icon_response.headers.get('Last-Modified'), source_hash)
+        return rgba
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,47 +1,78 @@
-import wx
-from PIL import Image, ImageOps
-
 class IconProcessing:
 
     ICON_SIZE = (58, 58) # account for 10px transparent padding
+    MARGIN = 10 # transparent margin around the source image, in source pixels, before it's scaled to ICON_SIZE
 
     @staticmethod
-    def load_and_pad_image(image_path_or_data):
+    def load_and_pad_image(image_path):
+        # for our own bundled icons, which wx opens without complaint, so the window can be drawn without
+        # waiting for Pillow to import
+        import wx
+        image = wx.Image(image_path)
+        if not image.IsOk():
+            return None
+        if not image.HasAlpha():
+            image.InitAlpha()
+        margin = IconProcessing.MARGIN
+        # the new border is transparent because the image has an alpha channel
+        image.Resize((image.GetWidth() + 2 * margin, image.GetHeight() + 2 * margin), (margin, margin))
+        return wx.Bitmap(image.Scale(IconProcessing.ICON_SIZE[0], IconProcessing.ICON_SIZE[1], wx.IMAGE_QUALITY_HIGH))
+
+    @staticmethod
+    def load_and_pad_image_rgba(image_path_or_data):
+        # returns the padded icon as raw RGBA bytes rather than a wx.Bitmap so it can be called from a
+        # worker thread (bitmaps are GUI resources and must only be created on the main thread) and so the
+        # result can be written straight to the icon cache.
+        # We have to use Pillow here because trying to open an icon with transparency in wx.Image
+        # throws a user-facing error messagebox in wxPython.
         try:
+            from PIL import Image
             pil_image = Image.open(image_path_or_data)
-            pil_image.load()
-            return IconProcessing.add_padding_to_image(pil_image)
+            return IconProcessing.pad_image(pil_image)
         except Exception as e:
             print("Failed to load image.")
             print(e)
             return None
 
     @staticmethod
-    def scale_image(image):
-        image = wx.Image(image)
-        image = image.Scale(IconProcessing.ICON_SIZE[0], IconProcessing.ICON_SIZE[1], wx.IMAGE_QUALITY_HIGH)
-        return wx.Bitmap(image)
+    def bitmap_from_rgba(rgba):
+        import wx
+        return wx.Bitmap.FromBufferRGBA(IconProcessing.ICON_SIZE[0], IconProcessing.ICON_SIZE[1], rgba)
 
     @staticmethod
-    def add_padding_to_image(pil_image):
-        try:
-            # we have to use Pillow here because trying to open an icon with transparency in wx.Image
-            # throws a user-facing error messagebox in wxPython
-            pil_image.load()
+    def pad_image(pil_image):
+        # Scales the image straight to its final size and pastes it into a transparent ICON_SIZE canvas, which
+        # gives the same result as adding the margin at full size and scaling the lot, without ever holding a
+        # padded full-size copy. The canvas's bytes are the RGBA buffer the bitmap is made from.
+        from PIL import Image
+        width, height = IconProcessing.ICON_SIZE
+        source_width, source_height = pil_image.size
+        scaled_width = max(1, round(width * source_width / (source_width + 2 * IconProcessing.MARGIN)))
+        scaled_height = max(1, round(height * source_height / (source_height + 2 * IconProcessing.MARGIN)))
 
-            if pil_image.mode != 'RGBA':
-                pil_image = pil_image.convert('RGBA')
+        if pil_image.format == 'ICO':
+            # .ico files hold several sizes and Pillow decodes the largest; the smallest one that's still
+            # big enough is much cheaper to decode and looks the same once scaled
+            sizes = sorted(pil_image.info.get('sizes', ()))
+            big_enough = [size for size in sizes if size[0] >= scaled_width and size[1] >= scaled_height]
+            if big_enough:
+                pil_image.size = big_enough[0]
+        else:
+            # lets JPEGs decode at a fraction of their size; does nothing for other formats
+            pil_image.draft('RGBA', (scaled_width, scaled_height))
 
-            # Add a transparent margin to the image
-            margin = 10  # The size of the margin
-            pil_image_with_margin = ImageOps.expand(pil_image, border=margin, fill=(0, 0, 0, 0))
+        pil_image.load()
+        if pil_image.mode != 'RGBA':
+            pil_image = pil_image.convert('RGBA')
+        # scale with premultiplied alpha so transparent pixels don't bleed dark fringes into the edges. Big
+        # images are first shrunk by a whole factor with a cheap box filter, so the expensive filter only
+        # sees a few times as many pixels as it produces.
+        pil_image = pil_image.convert('RGBa')
+        factor = min(pil_image.width // (scaled_width * 2), pil_image.height // (scaled_height * 2))
+        if factor > 1:
+            pil_image = pil_image.reduce(factor)
+        pil_image = pil_image.resize((scaled_width, scaled_height), Image.Resampling.LANCZOS).convert('RGBA')
 
-            wx_image = wx.Image(pil_image_with_margin.size[0], pil_image_with_margin.size[1])
-            wx_image.SetData(pil_image_with_margin.convert('RGB').tobytes())
-            wx_image.SetAlpha(pil_image_with_margin.convert('RGBA').tobytes()[3::4])
-
-            return wx.Bitmap(IconProcessing.scale_image(wx_image))
-        except Exception as e:
-            print("Failed to parse image.")
-            print(e)
-            return None
+        canvas = Image.new('RGBA', IconProcessing.ICON_SIZE, (0, 0, 0, 0))
+        canvas.paste(pil_image, ((width - scaled_width) // 2, (height - scaled_height) // 2))
+        return canvas.tobytes()
@@ -0,0 +1,263 @@
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import urljoin
+
+from worker_pool import WorkerPool
+
+IMG_TAG = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+IMG_SRC = re.compile(r'\bsrc\s*=\s*(["\'])(.*?)\1', re.IGNORECASE | re.DOTALL)
+
+def image_urls(content, base_url=None):
+    # absolute URLs of the images in an article's HTML, resolved against the article's link like a browser would
+    urls = []
+    for tag in IMG_TAG.findall(content or ''):
+        match = IMG_SRC.search(tag)
+        if match is None:
+            continue
+        url = image_url(match.group(2), base_url)
+        if url is not None and url not in urls:
+            urls.append(url)
+    return urls
+
+def image_url(src, base_url=None):
+    url = urljoin(base_url or '', html.unescape(src.strip()))
+    return url if url.startswith(('http://', 'https://')) else None
+
+class ImageCache:
+
+    CACHE_DIR = 'image_cache'
+    INDEX_FILE = 'index.json'
+    MAX_SIZE_BYTES = 64 * 1024 * 1024
+    # bigger images are left to the web view rather than being kept here
+    MAX_IMAGE_BYTES = 4 * 1024 * 1024
+    # files younger than this may belong to another process (the app or `yaffle sync`) that hasn't saved its
+    # index yet, so they aren't treated as orphans
+    ORPHAN_AGE = 60 * 60 # seconds
+
+    def __init__(self, cache_dir=CACHE_DIR, max_size_bytes=MAX_SIZE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        # the prefetcher writes to the cache from its worker threads
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # image URL -> {hash, content_type, size, last_used}. Image files are named by the hash of their
+        # contents, so the same image used by several articles (or at several URLs) is only stored once.
+        self.index = self.load_index()
+        # image hash -> how many URLs refer to it
+        self.references = Counter(entry['hash'] for entry in self.index.values())
+        self.size_bytes = sum({entry['hash']: entry['size'] for entry in self.index.values()}.values())
+        # whether images have been added since the index was last saved
+        self.changed = False
+        self.remove_orphans()
+
+    def load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE), 'r', encoding='utf-8') as index_file:
+                return json.load(index_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Starting with an empty image cache: {e}")
+            return {}
+
+    def remove_orphans(self):
+        # images written after the index was last saved (e.g. if we crashed) aren't in it, so tidy them up, along
+        # with temp files left by a crash mid-write
+        try:
+            file_names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        cutoff = time.time() - self.ORPHAN_AGE
+        for file_name in file_names:
+            if file_name != self.INDEX_FILE and file_name not in self.references:
+                try:
+                    if os.path.getmtime(os.path.join(self.cache_dir, file_name)) < cutoff:
+                        os.remove(os.path.join(self.cache_dir, file_name))
+                except OSError:
+                    pass
+
+    def blob_path(self, content_hash):
+        return os.path.join(self.cache_dir, content_hash)
+
+    def __contains__(self, url):
+        with self.lock:
+            return url in self.index
+
+    def get(self, url):
+        # returns (image bytes, content type), or None if we don't have it
+        with self.lock:
+            entry = self.index.get(url)
+            if entry is None:
+                return None
+            entry['last_used'] = time.time()
+        # read without holding the lock, so a big image doesn't hold up the prefetcher's workers
+        try:
+            with open(self.blob_path(entry['hash']), 'rb') as image_file:
+                data = image_file.read()
+        except OSError:
+            with self.lock:
+                if self.index.get(url) is entry:
+                    self.remove(url)
+            return None
+        return data, entry['content_type']
+
+    def put(self, url, data, content_type):
+        content_hash = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            entry = self.index.get(url)
+            if entry is not None and entry['hash'] == content_hash:
+                # the same image again: removing the old entry first would take the file with it
+                entry['content_type'] = content_type
+                entry['last_used'] = time.time()
+                return
+            if content_hash not in self.references:
+                try:
+                    # write then rename so a crash can never leave a half-written image behind. The temp file is
+                    # this process's own, as the app and `yaffle sync` may be writing the same image at once.
+                    temp_path = f"{self.blob_path(content_hash)}.{os.getpid()}.tmp"
+                    with open(temp_path, 'wb') as image_file:
+                        image_file.write(data)
+                    os.replace(temp_path, self.blob_path(content_hash))
+                except OSError as e:
+                    print(f"Failed to cache image {url}: {e}")
+                    return
+                self.size_bytes += len(data)
+            self.remove(url)
+            self.references[content_hash] += 1
+            self.index[url] = {'hash': content_hash, 'content_type': content_type, 'size': len(data),
+                               'last_used': time.time()}
+            self.changed = True
+            self.enforce_size_cap()
+
+    def enforce_size_cap(self):
+        # callers must hold the lock
+        if self.size_bytes <= self.max_size_bytes:
+            return
+        for url in sorted(self.index, key=lambda url: self.index[url]['last_used']):
+            self.remove(url)
+            if self.size_bytes <= self.max_size_bytes:
+                return
+
+    def remove(self, url):
+        # callers must hold the lock. The image file goes once no other URL refers to it.
+        entry = self.index.pop(url, None)
+        if entry is None:
+            return
+        self.references[entry['hash']] -= 1
+        if self.references[entry['hash']] > 0:
+            return
+        del self.references[entry['hash']]
+        self.size_bytes -= entry['size']
+        try:
+            os.remove(self.blob_path(entry['hash']))
+        except OSError:
+            pass
+
+    def merge_saved_index(self):
+        # callers must hold the lock. Keeps images another process has saved since we loaded the index, as
+        # long as their files are still there.
+        for url, entry in self.load_index().items():
+            if url in self.index:
+                continue
+            if entry['hash'] not in self.references:
+                if not os.path.exists(self.blob_path(entry['hash'])):
+                    continue
+                self.size_bytes += entry['size']
+            self.references[entry['hash']] += 1
+            self.index[url] = entry
+
+    def save_if_changed(self):
+        # another process opening the cache treats images missing from the saved index as orphans once they're
+        # ORPHAN_AGE old, so the index is saved after each batch of images rather than only on exit
+        with self.lock:
+            changed = self.changed
+        if changed:
+            self.save()
+
+    def save(self):
+        with self.lock:
+            self.changed = False
+            self.merge_saved_index()
+            self.enforce_size_cap()
+            try:
+                temp_path = os.path.join(self.cache_dir, f"{self.INDEX_FILE}.{os.getpid()}.tmp")
+                with open(temp_path, 'w', encoding='utf-8') as index_file:
+                    json.dump(self.index, index_file)
+                os.replace(temp_path, os.path.join(self.cache_dir, self.INDEX_FILE))
+            except OSError as e:
+                print(f"Failed to save image cache: {e}")
+
+class ImagePrefetcher:
+
+    MAX_WORKERS = 2
+    TIMEOUT = 10 # seconds
+
+    def __init__(self, image_cache, max_workers=MAX_WORKERS):
+        self.image_cache = image_cache
+        self.max_workers = max_workers
+        # images come from all over the web rather than from Yarr, so they get their own session, made on
+        # first use like the client's
+        self.session = None
+        self.executor = WorkerPool(max_workers, thread_name_prefix='image-prefetch')
+        self.in_flight = set()
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def prefetch(self, item_data):
+        # item_data is an article from /api/items/{id} (or the local store); safe to call from any thread
+        for url in image_urls(item_data.get('content'), item_data.get('link')):
+            with self.lock:
+                if self.closed or url in self.in_flight or url in self.image_cache:
+                    continue
+                self.in_flight.add(url)
+                # submitted under the lock so it can't race with shutdown
+                self.executor.submit(self.fetch, url)
+
+    def get_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        with self.lock:
+            if self.session is None:
+                self.session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=self.max_workers)
+                self.session.mount('http://', adapter)
+                self.session.mount('https://', adapter)
+            return self.session
+
+    def fetch(self, url):
+        import requests
+        from urllib3.exceptions import HTTPError
+        try:
+            with self.get_session().get(url, timeout=self.TIMEOUT, stream=True) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+                if not content_type.startswith('image/'):
+                    return
+                data = response.raw.read(self.image_cache.MAX_IMAGE_BYTES + 1, decode_content=True)
+                if len(data) > self.image_cache.MAX_IMAGE_BYTES:
+                    return
+                self.image_cache.put(url, data, content_type)
+        except (requests.RequestException, HTTPError) as e:
+            # the body is read straight from urllib3, whose errors don't come wrapped as requests errors
+            print(f"Failed to prefetch image {url}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard(url)
+                idle = not self.in_flight
+            if idle:
+                self.image_cache.save_if_changed()
+
+    def shutdown(self, wait=False):
+        # the app drops whatever is still queued; `yaffle sync` waits for it
+        with self.lock:
+            self.closed = True
+            session = self.session
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+        if session is not None:
+            session.close()
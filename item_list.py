@@ -0,0 +1,261 @@
+from bisect import bisect_right
+from collections import OrderedDict
+
+import wx
+
+def get_item_title(feed_item):
+    if feed_item.title:
+        return str(feed_item.title)
+    elif feed_item.date:
+        return str(feed_item.date)
+    else:
+        return "Untitled"
+
+class ItemRow:
+
+    # a row in the item list: just what the list shows and needs to page, without the article content, in a
+    # slotted object rather than a dict so a page of rows is small and cheap to make
+    __slots__ = ('id', 'feed_id', 'title', 'link', 'date', 'status')
+
+    def __init__(self, id, feed_id, title, link, date, status):
+        self.id = id
+        self.feed_id = feed_id
+        self.title = title
+        self.link = link
+        self.date = date
+        self.status = status
+
+    @classmethod
+    def from_json(cls, item):
+        # from an item in an /api/items response, or the local store's equivalent
+        return cls(item['id'], item['feed_id'], item.get('title'), item.get('link'), item.get('date'), item.get('status'))
+
+    def to_json(self):
+        return {'id': self.id, 'feed_id': self.feed_id, 'title': self.title, 'link': self.link, 'date': self.date,
+                'status': self.status}
+
+class PagedItemLoader:
+
+    # pages of items kept in memory; pages that fall out are fetched again if they scroll back into view
+    PAGE_CACHE_SIZE = 10
+
+    def __init__(self, fetch_page, background_tasks, on_page_loaded, page_cache_size=PAGE_CACHE_SIZE, fetch_local_page=None):
+        # fetch_page(after) runs on a worker thread and returns the Yarr /api/items response for the page
+        # starting after the given item ID (None for the first page), with the items as ItemRows
+        self.fetch_page = fetch_page
+        # optional: the same thing from the local article store, used for a first screen before Yarr answers
+        # and for every page once Yarr has turned out to be unreachable
+        self.fetch_local_page = fetch_local_page
+        self.offline = False
+        self.provisional = False
+        self.background_tasks = background_tasks
+        # called on the main thread with (page_number, items) whenever a page arrives
+        self.on_page_loaded = on_page_loaded
+        # None keeps every page. Listings filtered by status (rivers) need that: they shrink as items are
+        # read, so a page fetched again from its cursor would no longer line up with the rows around it.
+        self.page_cache_size = page_cache_size
+
+        # Yarr paginates with a cursor (the ID of the last item seen), so pages can only be discovered in order.
+        # The cursor and first row of every page seen so far are kept, which is enough to refetch any page later.
+        self.cursors = [None]
+        self.page_offsets = [0]
+        self.row_count = 0
+        self.has_more = True
+
+        self.pages = OrderedDict() # page number -> list of items, in least recently used order
+        self.pending = set()
+        # page number -> future for requests not yet answered, so a replaced loader can cancel its queue
+        self.futures = {}
+        self.failed = False
+        self.closed = False
+
+    def load_local_first_page(self):
+        # show the first page from the local store straight away; Yarr's copy replaces it when it arrives
+        if self.fetch_local_page is None:
+            return
+        data = self.fetch_local_page(None)
+        if data['list']:
+            self.page_loaded(0, data)
+            self.provisional = True
+            self.request_page(0, force=True)
+
+    def close(self):
+        # a loader that has been replaced (e.g. by selecting another feed) cancels requests that haven't started,
+        # so scrolling through the tree doesn't queue a fetch per feed ahead of the one now selected, and
+        # ignores results from any already in flight
+        self.closed = True
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+    def display_count(self):
+        # one extra row while there is more to load: it shows "Loading..." and asks for the next page when drawn
+        return self.row_count + (1 if self.has_more else 0)
+
+    def page_for_row(self, index):
+        page_number = bisect_right(self.page_offsets, index) - 1
+        return min(page_number, len(self.cursors) - 1)
+
+    def peek(self, index):
+        # like item_at, but never fetches anything or changes which pages are kept
+        if index < 0 or index >= self.row_count:
+            return None
+        page_number = self.page_for_row(index)
+        page = self.pages.get(page_number)
+        row = index - self.page_offsets[page_number]
+        if page is None or row >= len(page):
+            return None
+        return page[row]
+
+    def loaded_items(self):
+        # items in the pages currently in memory, in list order
+        for page_number in sorted(self.pages):
+            yield from self.pages[page_number]
+
+    def item_at(self, index):
+        # returns the item shown in a row, or None if its page isn't loaded yet (in which case it is requested)
+        page_number = self.page_for_row(index)
+
+        page = self.pages.get(page_number)
+        if page is None:
+            self.request_page(page_number)
+            return None
+        self.pages.move_to_end(page_number)
+
+        row = index - self.page_offsets[page_number]
+        if row >= len(page):
+            # this is the trailing "Loading..." row, so the viewport has reached the end of what we have
+            self.request_page(page_number + 1)
+            return None
+        return page[row]
+
+    def request_page(self, page_number, force=False):
+        if self.failed or page_number in self.pending or page_number >= len(self.cursors):
+            return
+        if self.provisional and not force:
+            # wait for Yarr's first page before carrying on from the local one
+            return
+        self.pending.add(page_number)
+        cursor = self.cursors[page_number]
+        self.futures[page_number] = self.background_tasks.submit(lambda: self.fetch_page_or_local(cursor),
+                                                                 lambda data: self.page_loaded(page_number, data),
+                                                                 self.page_failed)
+
+    def fetch_page_or_local(self, cursor):
+        # runs on a worker thread
+        import requests
+        if self.offline:
+            return self.fetch_local_page(cursor)
+        try:
+            return self.fetch_page(cursor)
+        except requests.RequestException as e:
+            if self.fetch_local_page is None:
+                raise
+            print(f"Failed to fetch items, reading from the local store instead: {e}")
+            self.offline = True
+            return self.fetch_local_page(cursor)
+
+    def page_loaded(self, page_number, data):
+        if self.closed:
+            return
+        self.pending.discard(page_number)
+        self.futures.pop(page_number, None)
+        items = data['list']
+
+        if self.provisional and page_number == 0:
+            # Yarr's first page has arrived, so forget everything worked out from the local one
+            self.provisional = False
+            self.cursors = [None]
+            self.page_offsets = [0]
+            self.row_count = 0
+            self.has_more = True
+            self.pages.clear()
+
+        # the first time we see a page, record where it starts and the cursor for the page after it
+        if page_number == len(self.cursors) - 1:
+            self.row_count += len(items)
+            self.has_more = bool(data.get('has_more')) and len(items) > 0
+            if self.has_more:
+                self.cursors.append(items[-1].id)
+                self.page_offsets.append(self.row_count)
+
+        self.pages[page_number] = items
+        self.pages.move_to_end(page_number)
+        while self.page_cache_size is not None and len(self.pages) > self.page_cache_size:
+            self.pages.popitem(last=False)
+
+        self.on_page_loaded(page_number, items)
+
+    def page_failed(self, error):
+        if self.closed:
+            return
+        print(f"Failed to fetch items: {error}")
+        self.failed = True
+        self.pending.clear()
+        self.futures.clear()
+        self.on_page_loaded(None, [])
+
+    def page_range(self, page_number):
+        start = self.page_offsets[page_number]
+        end = self.page_offsets[page_number + 1] if page_number + 1 < len(self.page_offsets) else self.row_count
+        return start, end
+
+class ItemListCtrl(wx.ListCtrl):
+
+    def __init__(self, parent, model):
+        super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL)
+        # rows are drawn on demand from the current loader, and read state comes from the model
+        self.model = model
+        self.loader = None
+
+        bold_font = wx.SystemSettings.GetFont(wx.SYS_DEFAULT_GUI_FONT)
+        bold_font.SetWeight(wx.FONTWEIGHT_BOLD)
+        self.unread_attr = wx.ItemAttr()
+        self.unread_attr.SetFont(bold_font)
+
+        normal_font = wx.SystemSettings.GetFont(wx.SYS_DEFAULT_GUI_FONT)
+        normal_font.SetWeight(wx.FONTWEIGHT_NORMAL)
+        self.read_attr = wx.ItemAttr()
+        self.read_attr.SetFont(normal_font)
+
+        self.placeholder_attr = wx.ItemAttr()
+        self.placeholder_attr.SetFont(normal_font)
+        self.placeholder_attr.SetTextColour(wx.SystemSettings.GetColour(wx.SYS_COLOUR_GRAYTEXT))
+
+    def set_loader(self, loader):
+        if self.loader is not None:
+            self.loader.close()
+        self.loader = loader
+        self.SetItemCount(0 if loader is None else loader.display_count())
+        self.Refresh()
+
+    def on_page_loaded(self, page_number):
+        self.SetItemCount(self.loader.display_count())
+        if page_number is None:
+            self.Refresh()
+            return
+        start, end = self.loader.page_range(page_number)
+        if end > start:
+            self.RefreshItems(start, min(end, self.GetItemCount()) - 1)
+        # the trailing "Loading..." row may now be a real row, or gone
+        if self.loader.display_count() > 0:
+            self.RefreshItem(self.loader.display_count() - 1)
+
+    def get_item(self, index):
+        if self.loader is None or index < 0:
+            return None
+        return self.loader.item_at(index)
+
+    def OnGetItemText(self, index, column):
+        item = self.get_item(index)
+        if item is None:
+            return 'Failed to load items' if self.loader is not None and self.loader.failed else 'Loading...'
+        return get_item_title(item)
+
+    def OnGetItemAttr(self, index):
+        item = self.get_item(index)
+        if item is None:
+            return self.placeholder_attr
+        model_item = self.model.items.get(item.id)
+        status = model_item.status if model_item is not None else item.status
+        return self.unread_attr if status == 'unread' else self.read_attr
@@ -0,0 +1,93 @@
+import codecs
+import json
+import re
+
+NOT_WHITESPACE = re.compile(r'[^ \t\n\r]')
+# what can follow a complete value (or an object key) in this shape of response
+VALUE_ENDS = ',]}:'
+
+def parse_list_response(chunks, list_key='list', make_element=None):
+    # Parses a JSON object such as Yarr's {"has_more": true, "list": [...]} from an iterable of byte chunks as
+    # they arrive. Each element of list_key is handed to make_element as soon as it is complete, so only one
+    # element is ever held as a dict and the body is never held as a whole; the other keys are parsed as usual.
+    # Returns the object, with list_key holding whatever make_element returned for each element.
+    reader = ChunkReader(chunks)
+    result = {}
+    reader.expect('{')
+    if reader.peek() == '}':
+        return result
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == list_key:
+            result[key] = [make_element(element) if make_element is not None else element
+                           for element in reader.elements()]
+        else:
+            result[key] = reader.value()
+        if reader.expect(',}') == '}':
+            return result
+
+class ChunkReader:
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.finished = False
+
+    def fill(self):
+        # appends the next chunk, dropping what has already been parsed
+        if self.finished:
+            raise json.JSONDecodeError('Unexpected end of response', self.buffer, len(self.buffer))
+        try:
+            text = self.utf8.decode(next(self.chunks))
+        except StopIteration:
+            text = self.utf8.decode(b'', final=True)
+            self.finished = True
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+
+    def peek(self):
+        while True:
+            match = NOT_WHITESPACE.search(self.buffer, self.position)
+            if match is not None:
+                self.position = match.start()
+                return self.buffer[self.position]
+            self.position = len(self.buffer)
+            self.fill()
+
+    def expect(self, characters):
+        character = self.peek()
+        if character not in characters:
+            raise json.JSONDecodeError(f"Expected one of {characters!r}", self.buffer, self.position)
+        self.position += 1
+        return character
+
+    def value(self):
+        # a complete value can't be told apart from one cut off by the end of a chunk until what follows it has
+        # arrived: "12." decodes as 12, for example. So a value is only taken once the next character is one
+        # that can come after a value; until then (or the end of the response) it waits for more.
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                following = NOT_WHITESPACE.search(self.buffer, end)
+                if self.finished or (following is not None and following.group() in VALUE_ENDS):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.finished:
+                    raise
+            self.fill()
+
+    def elements(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class StatusQueue:
+
+    QUEUE_FILE = 'pending_status.json'
+    # wait this long after a change before sending, so a burst of changes goes out together
+    FLUSH_DELAY = 0.5 # seconds
+    MAX_BACKOFF = 60 # seconds
+
+    def __init__(self, yarr_client, queue_file=QUEUE_FILE):
+        self.yarr_client = yarr_client
+        self.queue_file = queue_file
+
+        # ('item', id), ('feed', id) or ('folder', id) -> the change to send, in the order they were made.
+        # Changing the same item again replaces its entry, so toggling an item back and forth sends one request.
+        self.pending = OrderedDict()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.load()
+
+        self.thread = threading.Thread(target=self.run, name='status-queue', daemon=True)
+        self.thread.start()
+
+    def load(self):
+        # anything left over from last time (e.g. because Yarr was unreachable) is replayed now
+        self.pending.update(self.read_pending(self.queue_file))
+
+    @staticmethod
+    def read_pending(queue_file=QUEUE_FILE):
+        # the changes saved to disk, without sending them; `yaffle sync` uses this so it doesn't overwrite
+        # local changes that haven't reached Yarr yet
+        pending = OrderedDict()
+        try:
+            with open(queue_file, 'r', encoding='utf-8') as queue_file:
+                for kind, id, change in json.load(queue_file):
+                    pending[(kind, id)] = change
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Failed to load pending status changes: {e}")
+        return pending
+
+    def save(self):
+        # callers must hold the condition's lock
+        try:
+            if not self.pending:
+                if os.path.exists(self.queue_file):
+                    os.remove(self.queue_file)
+                return
+            temp_path = self.queue_file + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as queue_file:
+                json.dump([[kind, id, change] for (kind, id), change in self.pending.items()], queue_file)
+            os.replace(temp_path, self.queue_file)
+        except OSError as e:
+            print(f"Failed to save pending status changes: {e}")
+
+    def set_item_status(self, item_id, feed_id, status):
+        with self.condition:
+            self.pending.pop(('item', item_id), None)
+            self.pending[('item', item_id)] = {'status': status, 'feed_id': feed_id}
+            self.save()
+            self.condition.notify()
+
+    def mark_read(self, kind, id, feed_ids):
+        # kind is 'feed' or 'folder'. One request marks everything in it as read, which makes any
+        # queued changes to individual items in those feeds redundant.
+        with self.condition:
+            for key in [key for key, change in self.pending.items()
+                        if key[0] == 'item' and change['feed_id'] in feed_ids]:
+                del self.pending[key]
+            self.pending.pop((kind, id), None)
+            self.pending[(kind, id)] = {}
+            self.save()
+            self.condition.notify()
+
+    def pending_item_status(self, item_id):
+        # lets freshly fetched items show local changes that haven't reached the server yet
+        with self.condition:
+            change = self.pending.get(('item', item_id))
+            return change['status'] if change is not None else None
+
+    def pending_read_feed_ids(self, folders):
+        # the feeds with a "mark all read" still queued; folders maps folder IDs to Folders, to expand folder marks
+        with self.condition:
+            return self.read_feed_ids(self.pending, folders)
+
+    @staticmethod
+    def read_feed_ids(pending, folders):
+        feed_ids = set()
+        for kind, id in pending:
+            if kind == 'feed':
+                feed_ids.add(id)
+            elif kind == 'folder' and id in folders:
+                feed_ids.update(folders[id].feed_ids)
+        return feed_ids
+
+    def run(self):
+        import requests
+        backoff = 1
+        # after a failure nothing is sent before this (time.monotonic()), however many changes come in meanwhile
+        retry_at = None
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if retry_at is not None:
+                    while not self.closed and time.monotonic() < retry_at:
+                        self.condition.wait(retry_at - time.monotonic())
+                if self.closed:
+                    return
+                # give a burst of changes a moment to settle before sending
+                self.condition.wait(self.FLUSH_DELAY)
+                batch = list(self.pending.items())
+
+            failed = False
+            sent = []
+            for key, change in batch:
+                try:
+                    self.send(key, change)
+                except requests.HTTPError as e:
+                    if e.response is not None and 400 <= e.response.status_code < 500:
+                        # retrying won't help (e.g. the item has been deleted), so give up on this one
+                        print(f"Yarr rejected status change for {key[0]} {key[1]}: {e}")
+                    else:
+                        print(f"Failed to send status change for {key[0]} {key[1]}, will retry: {e}")
+                        failed = True
+                        break
+                except requests.RequestException as e:
+                    print(f"Failed to send status change for {key[0]} {key[1]}, will retry: {e}")
+                    failed = True
+                    break
+                sent.append((key, change))
+
+            # saved once for the whole batch; if we're killed before this, the sent changes are just sent again
+            with self.condition:
+                removed = False
+                for key, change in sent:
+                    # only forget it if it hasn't been changed again while we were sending
+                    if self.pending.get(key) is change:
+                        del self.pending[key]
+                        removed = True
+                if removed:
+                    self.save()
+
+            if failed:
+                retry_at = time.monotonic() + backoff
+                backoff = min(backoff * 2, self.MAX_BACKOFF)
+            else:
+                retry_at = None
+                backoff = 1
+
+    def send(self, key, change):
+        kind, id = key
+        if kind == 'item':
+            self.yarr_client.update_item_status(id, change['status'])
+        elif kind == 'feed':
+            self.yarr_client.mark_items_read(feed_id=id)
+        elif kind == 'folder':
+            self.yarr_client.mark_items_read(folder_id=id)
+
+    def shutdown(self):
+        # whatever hasn't been sent is already on disk and will be sent next time
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
@@ -0,0 +1,192 @@
+# `yaffle sync`: brings Yaffle's local copies up to date from Yarr without opening a window, so the app can
+# start from local data. That means the folder/feed snapshot, the unread items and their articles (in the
+# offline store), the images in those articles, and feed icons. Run it from cron, or leave it running with
+# --interval; a lock file stops two syncs overlapping, and it's safe to run while the app is open.
+#
+#   python yaffle.py sync [--interval SECONDS]
+#   python sync.py [--interval SECONDS] (what yaffle-sync.exe runs)
+
+import argparse
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config_management
+from article_store import ArticleStore
+from feed_model import FeedModel
+from file_lock import FileLock
+from icon_cache import IconCache
+from icon_loader import IconLoader
+from image_cache import ImageCache, ImagePrefetcher
+from status_queue import StatusQueue
+from tracing import Tracer
+from yarr_client import YarrClient
+
+LOCK_FILE = 'yaffle-sync.lock'
+
+class Sync:
+
+    # the date of the newest item seen by the last sync; anything older was stored then
+    CURSOR_KEY = 'sync_cursor'
+
+    def __init__(self, config):
+        self.tracer = Tracer.from_config(config)
+        self.yarr_client = YarrClient.from_config(config, self.tracer)
+        # without the offline store there's nowhere to keep articles, so only the snapshot and icons are synced
+        self.article_store = ArticleStore.from_config(config)
+        # as many requests at once as the client keeps connections for
+        self.executor = ThreadPoolExecutor(max_workers=self.yarr_client.pool_size, thread_name_prefix='sync')
+
+    def run(self):
+        # returns False if the sync didn't finish. Anything that can go wrong while the app is open too - Yarr
+        # being unreachable, the store staying locked, a cache file being in use - only fails this run, so a
+        # sync left running with --interval tries again next time.
+        import requests
+        start = time.perf_counter()
+        try:
+            with self.tracer.span('sync'):
+                stats = self.sync()
+        except (requests.RequestException, sqlite3.Error, OSError) as e:
+            print(f"Sync failed: {e}")
+            return False
+        print(f"Synced {stats['feeds']} feeds: checked {stats['items']} unread items, fetched {stats['articles']} new articles "
+              f"and {stats['icons']} changed icons in {time.perf_counter() - start:.1f}s")
+        return True
+
+    def sync(self):
+        folders = self.executor.submit(self.yarr_client.get_folders)
+        feeds = self.executor.submit(self.yarr_client.get_feeds)
+        status = self.executor.submit(self.yarr_client.get_status)
+        folder_data, feed_data, status_data = folders.result(), feeds.result(), status.result()
+
+        model = FeedModel()
+        model.load(folder_data, feed_data, status_data)
+        # the app draws its tree from this before it hears from Yarr; keep whichever feed it had selected
+        snapshot = config_management.load_snapshot() or {}
+        config_management.write_snapshot(model, snapshot.get('selected_feed'))
+
+        stats = {'feeds': len(model.feeds), 'items': 0, 'articles': 0, 'icons': 0}
+        if self.article_store is not None:
+            self.article_store.replace_folders_and_feeds(folder_data, feed_data)
+            stats['items'], stats['articles'] = self.sync_items(model)
+            self.article_store.apply_retention()
+        stats['icons'] = self.sync_icons(model)
+        return stats
+
+    def sync_items(self, model):
+        cursor = self.article_store.get_meta(self.CURSOR_KEY)
+        # changes the app has made but not sent yet win over what Yarr says
+        self.pending = StatusQueue.read_pending()
+        self.pending_read_feed_ids = StatusQueue.read_feed_ids(self.pending, model.folders)
+
+        local_counts = self.article_store.unread_counts()
+        for feed_id in local_counts:
+            if feed_id in model.feeds and model.feeds[feed_id].unread == 0:
+                self.article_store.reconcile_unread(feed_id, [])
+
+        # each feed's unread items are listed in parallel, newest first
+        feeds = [feed for feed in model.feeds.values() if feed.unread > 0]
+        items = []
+        for feed_items in self.executor.map(lambda feed: self.sync_feed_items(feed, cursor), feeds):
+            items.extend(feed_items)
+
+        # fetch the articles we don't have yet, and the images in them
+        image_cache = ImageCache()
+        image_prefetcher = ImagePrefetcher(image_cache)
+        stored = self.article_store.ids_with_content(item['id'] for item in items)
+        missing = [item['id'] for item in items if item['id'] not in stored]
+        try:
+            for data in self.executor.map(self.yarr_client.get_item, missing):
+                self.article_store.upsert_items(self.with_pending_status([data]))
+                image_prefetcher.prefetch(data)
+        finally:
+            image_prefetcher.shutdown(wait=True)
+            image_cache.save()
+
+        # only move the cursor on once everything up to it is stored
+        dates = [item['date'] for item in items if item.get('date')]
+        if dates and (cursor is None or max(dates) > cursor):
+            self.article_store.set_meta(self.CURSOR_KEY, max(dates))
+        return len(items), len(missing)
+
+    def sync_feed_items(self, feed, cursor):
+        # Yarr can't list only what's changed, so page through the feed's unread items until they're older than
+        # the cursor. Carry on to the end only if the unread count still doesn't match what we have, which means
+        # something older was read elsewhere - then anything we think is unread but Yarr doesn't is read.
+        items = []
+        after = None
+        complete = False
+        while True:
+            data = self.yarr_client.get_items(feed_id=feed.id, status='unread', after=after)
+            page = self.with_pending_status(data['list'])
+            self.article_store.upsert_items(page)
+            items.extend(page)
+            if not data.get('has_more') or not page:
+                complete = True
+                break
+            if cursor is not None and page[-1].get('date') and page[-1]['date'] < cursor and \
+                    self.article_store.unread_counts().get(feed.id, 0) == feed.unread:
+                break
+            after = page[-1]['id']
+        if complete:
+            self.article_store.reconcile_unread(feed.id, [item['id'] for item in items if item['status'] == 'unread'])
+        return items
+
+    def with_pending_status(self, item_data):
+        for item in item_data:
+            change = self.pending.get(('item', item['id']))
+            if change is not None:
+                item['status'] = change['status']
+            elif item['feed_id'] in self.pending_read_feed_ids:
+                item['status'] = 'read'
+        return item_data
+
+    def sync_icons(self, model):
+        icon_cache = IconCache()
+        icon_loader = IconLoader(self.yarr_client, icon_cache, None, self.tracer, max_workers=1)
+        try:
+            feed_ids = [feed.id for feed in model.feeds.values() if feed.has_icon]
+            changed = sum(1 for rgba in self.executor.map(icon_loader.update_icon, feed_ids) if rgba is not None)
+            icon_cache.evict_unsubscribed(set(feed_ids))
+        finally:
+            icon_loader.shutdown()
+            icon_cache.save()
+        return changed
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.yarr_client.close()
+        if self.article_store is not None:
+            self.article_store.close()
+        self.tracer.export()
+        self.tracer.print_summary()
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='yaffle sync', description='Sync Yaffle\'s local copies from Yarr')
+    parser.add_argument('--interval', type=int, default=0,
+                        help='keep running, syncing every this many seconds (default: sync once and exit)')
+    args = parser.parse_args(argv)
+
+    config = config_management.load_config()
+    lock = FileLock(LOCK_FILE)
+    if not lock.acquire():
+        print("Another sync is already running")
+        return 0
+    sync = Sync(config)
+    if sync.article_store is None:
+        print("offline_store is off in yaffle.ini, so only feeds and icons will be synced")
+    try:
+        while True:
+            succeeded = sync.run()
+            if args.interval <= 0:
+                return 0 if succeeded else 1
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        sync.close()
+        lock.release()
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from article_store import ArticleStore
+
+def make_item(item_id, feed_id, status='unread', content=None, title=None):
+    # IDs and dates go up together, as they do in Yarr
+    return {'id': item_id, 'feed_id': feed_id, 'title': title or f"Item {item_id}", 'link': f"https://example.com/{item_id}",
+            'date': f"2024-01-01T00:{item_id // 60:02}:{item_id % 60:02}Z", 'status': status, 'content': content}
+
+@pytest.fixture
+def store(tmp_path):
+    store = ArticleStore(str(tmp_path / 'yaffle.db'))
+    store.replace_folders_and_feeds([{'id': 1, 'title': 'News'}],
+                                    [{'id': 10, 'folder_id': 1, 'title': 'Paper', 'has_icon': False},
+                                     {'id': 20, 'folder_id': None, 'title': 'Loose', 'has_icon': False}])
+    yield store
+    store.close()
+
+def test_pages_newest_first(store):
+    store.upsert_items([make_item(item_id, 10 if item_id % 2 else 20) for item_id in range(1, 51)])
+    first = store.get_items_page()
+    assert first['has_more'] is True
+    assert [item['id'] for item in first['list']] == list(range(50, 30, -1))
+    second = store.get_items_page(after=31)
+    third = store.get_items_page(after=11)
+    assert [item['id'] for item in second['list']] == list(range(30, 10, -1))
+    assert [item['id'] for item in third['list']] == list(range(10, 0, -1))
+    assert third['has_more'] is False
+
+def test_filters(store):
+    store.upsert_items([make_item(item_id, 10 if item_id % 2 else 20, 'read' if item_id % 3 == 0 else 'unread')
+                        for item_id in range(1, 13)])
+    assert [item['id'] for item in store.get_items_page(feed_id=20)['list']] == [12, 10, 8, 6, 4, 2]
+    assert [item['id'] for item in store.get_items_page(folder_id=1)['list']] == [11, 9, 7, 5, 3, 1]
+    assert [item['id'] for item in store.get_items_page(feed_id=10, status='unread')['list']] == [11, 7, 5, 1]
+
+def test_upsert_keeps_content(store):
+    store.upsert_items([make_item(1, 10, content='<p>Body</p>')])
+    store.upsert_items([make_item(1, 10, status='read')])
+    item = store.get_item(1)
+    assert item['content'] == '<p>Body</p>'
+    assert item['status'] == 'read'
+    assert store.get_item(2) is None
+    assert store.ids_with_content([1, 2]) == {1}
+
+def test_unread_bookkeeping(store):
+    store.upsert_items([make_item(item_id, 10) for item_id in range(1, 6)] + [make_item(6, 20)])
+    store.reconcile_unread(10, [4, 5])
+    assert store.unread_counts() == {10: 2, 20: 1}
+    store.mark_items_read([20])
+    assert store.unread_counts() == {10: 2}
+
+def test_search(store):
+    if not store.search_available:
+        pytest.skip('SQLite was built without FTS5')
+    store.upsert_items([make_item(1, 10, title='Weather report', content='<p>Rain <b>later</b></p>'),
+                        make_item(2, 10, title='Sport', content='<p>The weather stopped play</p>'),
+                        make_item(3, 20, title='Markets', content='<p>Shares &amp; bonds</p>')])
+    # title matches rank above body matches, and the last word matches as a prefix
+    assert [item['id'] for item in store.search('weather')['list']] == [1, 2]
+    assert [item['id'] for item in store.search('wea')['list']] == [1, 2]
+    assert [item['id'] for item in store.search('shares bonds')['list']] == [3]
+    # markup isn't indexed
+    assert store.search('href')['list'] == [] and store.search('amp')['list'] == []
+    assert store.search('   ')['list'] == []
+
+    # the index follows updates and deletes
+    store.upsert_items([make_item(3, 20, title='Weather markets', content='<p>Shares</p>')])
+    assert [item['id'] for item in store.search('weather')['list']] == [3, 1, 2]
+
+def test_retention(tmp_path):
+    store = ArticleStore(str(tmp_path / 'yaffle.db'), max_age_days=30, max_items=3)
+    try:
+        store.upsert_items([make_item(item_id, 10, 'read' if item_id <= 6 else 'unread') for item_id in range(1, 9)])
+        old = time.time() - 31 * 24 * 60 * 60
+        with store.connection:
+            store.connection.execute('UPDATE items SET stored_at = ? WHERE id IN (1, 7)', (old,))
+        store.apply_retention()
+        # old read items go, then the oldest read items beyond max_items; unread ones stay however old
+        assert [item['id'] for item in store.get_items_page()['list']] == [8, 7, 6, 5, 4]
+    finally:
+        store.close()
@@ -0,0 +1,61 @@
+import threading
+
+from content_cache import ContentCache, ContentPrefetcher
+
+def item(item_id, content_bytes):
+    return {'id': item_id, 'title': '', 'content': 'x' * content_bytes}
+
+def test_least_recently_used_items_are_evicted():
+    cache = ContentCache(max_size_bytes=300)
+    for item_id in (1, 2, 3):
+        cache.put(item_id, item(item_id, 100))
+    # reading an item makes it the most recently used
+    assert cache.get(1) is not None
+    cache.put(4, item(4, 100))
+    assert 2 not in cache
+    assert all(item_id in cache for item_id in (1, 3, 4))
+    assert cache.size_bytes == 300
+
+def test_replacing_an_item_keeps_the_size_right():
+    cache = ContentCache(max_size_bytes=1000)
+    cache.put(1, item(1, 100))
+    cache.put(1, item(1, 300))
+    assert cache.size_bytes == 300
+    assert cache.get(1)['content'] == 'x' * 300
+
+def test_an_item_bigger_than_the_cache_is_still_kept():
+    # it's the one being read, so it stays until something else comes along
+    cache = ContentCache(max_size_bytes=100)
+    cache.put(1, item(1, 50))
+    cache.put(2, item(2, 500))
+    assert 1 not in cache
+    assert cache.get(2) is not None
+
+def test_stats():
+    cache = ContentCache()
+    cache.put(1, item(1, 10))
+    cache.get(1)
+    cache.get(1)
+    cache.get(2)
+    # checking for an item doesn't count
+    assert 3 not in cache
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['items'], stats['size_bytes']) == (2, 1, 1, 10)
+    assert abs(stats['hit_rate'] - 2 / 3) < 1e-9
+
+def test_prefetcher_skips_cached_and_in_flight_items():
+    cache = ContentCache()
+    cache.put(1, item(1, 10))
+    fetched = []
+    release = threading.Event()
+
+    def fetch_item(item_id):
+        release.wait(5)
+        fetched.append(item_id)
+        cache.put(item_id, item(item_id, 10))
+    prefetcher = ContentPrefetcher(fetch_item, cache, max_workers=1)
+    prefetcher.prefetch([1, 2, 3])
+    prefetcher.prefetch([2, 3])
+    release.set()
+    prefetcher.executor.shutdown(wait=True)
+    assert sorted(fetched) == [2, 3]
@@ -0,0 +1,83 @@
+from feed_model import FeedModel
+
+FOLDERS = [{'id': 1, 'title': 'News'}, {'id': 2, 'title': 'Blogs'}]
+FEEDS = [
+    {'id': 10, 'folder_id': 1, 'title': 'Paper', 'has_icon': True},
+    {'id': 11, 'folder_id': 1, 'title': 'Wire', 'has_icon': False},
+    {'id': 20, 'folder_id': 2, 'title': 'Someone', 'has_icon': True},
+    {'id': 30, 'folder_id': None, 'title': 'Loose', 'has_icon': False},
+]
+STATUS = {'stats': [{'feed_id': 10, 'unread': 3}, {'feed_id': 11, 'unread': 2}, {'feed_id': 30, 'unread': 1}]}
+
+def load():
+    model = FeedModel()
+    model.load(FOLDERS, FEEDS, STATUS)
+    return model
+
+def test_load():
+    model = load()
+    assert model.folders[1].feed_ids == {10, 11}
+    assert model.folders[FeedModel.ROOT_FOLDER_ID].feed_ids == {30}
+    assert model.folders[1].unread == 5
+    assert model.folders[2].unread == 0
+    assert model.river.unread == 6
+
+def test_update_with_nothing_new_changes_nothing():
+    model = load()
+    assert model.update(FOLDERS, FEEDS, STATUS).is_empty()
+
+def test_update_diffs():
+    model = load()
+    paper, wire, loose = model.feeds[10], model.feeds[11], model.feeds[30]
+    news, blogs = model.folders[1], model.folders[2]
+    folders = [{'id': 1, 'title': 'Newspapers'}, {'id': 3, 'title': 'Podcasts'}]
+    feeds = [
+        {'id': 10, 'folder_id': 1, 'title': 'Paper', 'has_icon': False},
+        {'id': 11, 'folder_id': 3, 'title': 'Wire', 'has_icon': False},
+        {'id': 30, 'folder_id': None, 'title': 'Loose ends', 'has_icon': False},
+        {'id': 40, 'folder_id': 3, 'title': 'Show', 'has_icon': True},
+    ]
+    status = {'stats': [{'feed_id': 10, 'unread': 4}, {'feed_id': 11, 'unread': 2}, {'feed_id': 40, 'unread': 7}]}
+    changes = model.update(folders, feeds, status)
+
+    # existing objects are changed in place
+    assert model.feeds[10] is paper and model.folders[1] is news
+    assert [folder.id for folder in changes.added_folders] == [3]
+    assert changes.removed_folders == [blogs]
+    assert [feed.id for feed in changes.added_feeds] == [40]
+    assert [feed.id for feed in changes.removed_feeds] == [20]
+    assert changes.moved_feeds == [wire]
+    assert changes.changed_icons == [paper]
+    assert {news, paper, loose, model.folders[3], model.folders[0], model.feeds[40]} <= changes.changed_nodes
+
+    assert news.title == 'Newspapers'
+    assert news.feed_ids == {10} and news.unread == 4
+    assert model.folders[3].feed_ids == {11, 40} and model.folders[3].unread == 9
+    assert model.folders[FeedModel.ROOT_FOLDER_ID].unread == 0
+    assert model.river.unread == 13
+
+def test_mark_read_groups():
+    model = load()
+    # all of News becomes one call; a feed at the root is never grouped as a folder
+    groups = model.mark_read_groups([10, 11, 30])
+    assert ('folder', 1, {10, 11}) in groups
+    assert ('feed', 30, {30}) in groups
+    assert len(groups) == 2
+
+    # part of a folder is marked feed by feed
+    assert model.mark_read_groups([10, 20]) == [('folder', 2, {20}), ('feed', 10, {10})]
+
+def test_mark_feeds_read_and_item_status():
+    model = load()
+    assert model.mark_feeds_read([10, 20]) == [model.feeds[10]]
+    assert model.folders[1].unread == 2
+
+    class Row:
+        def __init__(self, id, feed_id, status):
+            self.id, self.feed_id, self.status = id, feed_id, status
+    model.set_items([Row(1, 11, 'unread'), Row(2, 11, 'read')])
+    assert model.set_item_status(1, 'read') is model.feeds[11]
+    assert model.feeds[11].unread == 1
+    assert model.set_item_status(1, 'read') is None
+    assert model.set_item_status(2, 'unread') is model.feeds[11]
+    assert model.feeds[11].unread == 2
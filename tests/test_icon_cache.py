@@ -0,0 +1,59 @@
+import os
+
+from icon_cache import IconCache
+
+def icon(value):
+    return bytes([value]) * IconCache.ICON_BYTES
+
+def test_put_and_get(tmp_path):
+    cache = IconCache(str(tmp_path))
+    cache.put(1, icon(1), etag='"abc"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT', source_hash='hash')
+    assert cache.get(1) == icon(1)
+    assert cache.get(2) is None
+    assert cache.validators(1) == {'If-None-Match': '"abc"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    assert cache.validators(2) == {}
+    assert cache.has_source(1, 'hash') and not cache.has_source(1, 'other')
+
+def test_saved_index_is_loaded(tmp_path):
+    cache = IconCache(str(tmp_path))
+    cache.put(1, icon(1), etag='"abc"')
+    cache.save()
+    assert IconCache(str(tmp_path)).get(1) == icon(1)
+    assert IconCache(str(tmp_path)).validators(1) == {'If-None-Match': '"abc"'}
+
+def test_damaged_icons_are_dropped(tmp_path):
+    cache = IconCache(str(tmp_path))
+    cache.put(1, icon(1))
+    with open(cache.icon_path(1), 'wb') as icon_file:
+        icon_file.write(b'short')
+    assert cache.get(1) is None
+    assert cache.validators(1) == {}
+
+def test_evicts_unsubscribed_feeds(tmp_path):
+    cache = IconCache(str(tmp_path))
+    for feed_id in (1, 2, 3):
+        cache.put(feed_id, icon(feed_id))
+    cache.evict_unsubscribed({1, 3})
+    assert cache.get(2) is None
+    assert not os.path.exists(cache.icon_path(2))
+    assert cache.get(3) == icon(3)
+
+def test_size_cap_keeps_recently_used_icons(tmp_path):
+    cache = IconCache(str(tmp_path), max_size_bytes=2 * IconCache.ICON_BYTES)
+    for feed_id in (1, 2, 3):
+        cache.put(feed_id, icon(feed_id))
+        cache.index[feed_id]['last_used'] = feed_id
+    cache.touch(1)
+    cache.save()
+    assert sorted(cache.index) == [1, 3]
+    assert not os.path.exists(cache.icon_path(2))
+
+def test_keeps_icons_another_process_saved(tmp_path):
+    # the app and `yaffle sync` can both have the cache open
+    app_cache = IconCache(str(tmp_path))
+    sync_cache = IconCache(str(tmp_path))
+    sync_cache.put(2, icon(2))
+    sync_cache.save()
+    app_cache.put(1, icon(1))
+    app_cache.save()
+    assert sorted(IconCache(str(tmp_path)).index) == [1, 2]
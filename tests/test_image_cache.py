@@ -0,0 +1,40 @@
+import os
+
+from image_cache import ImageCache
+
+def test_put_the_same_image_again(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    cache.put('https://example.com/a.png', b'image', 'image/png')
+    cache.put('https://example.com/a.png', b'image', 'image/png')
+    assert cache.get('https://example.com/a.png') == (b'image', 'image/png')
+    assert cache.size_bytes == len(b'image')
+
+def test_images_shared_between_urls(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    cache.put('https://example.com/a.png', b'image', 'image/png')
+    cache.put('https://example.com/b.png', b'image', 'image/png')
+    assert cache.size_bytes == len(b'image')
+
+    # changing one URL's image leaves the other's alone
+    cache.put('https://example.com/a.png', b'other image', 'image/png')
+    assert cache.get('https://example.com/b.png') == (b'image', 'image/png')
+    assert cache.get('https://example.com/a.png') == (b'other image', 'image/png')
+    assert cache.size_bytes == len(b'image') + len(b'other image')
+
+    with cache.lock:
+        cache.remove('https://example.com/b.png')
+    assert cache.get('https://example.com/a.png') is not None
+    assert len([name for name in os.listdir(tmp_path) if name != ImageCache.INDEX_FILE]) == 1
+
+def test_orphans_are_only_images_missing_from_the_saved_index(tmp_path, monkeypatch):
+    # e.g. the app has cached images while `yaffle sync` opens the cache
+    monkeypatch.setattr(ImageCache, 'ORPHAN_AGE', 0)
+    app_cache = ImageCache(str(tmp_path))
+    app_cache.put('https://example.com/a.png', b'saved image', 'image/png')
+    app_cache.save_if_changed()
+    app_cache.put('https://example.com/b.png', b'unsaved image', 'image/png')
+
+    sync_cache = ImageCache(str(tmp_path))
+    assert sync_cache.get('https://example.com/a.png') == (b'saved image', 'image/png')
+    assert 'https://example.com/b.png' not in sync_cache
+    assert sorted(os.listdir(tmp_path)) == sorted([ImageCache.INDEX_FILE, app_cache.index['https://example.com/a.png']['hash']])
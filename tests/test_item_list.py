@@ -0,0 +1,175 @@
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip('wx')
+
+from item_list import ItemRow, PagedItemLoader
+
+PAGE_SIZE = 10
+
+class QueuedTasks:
+    # stands in for BackgroundTasks: work waits until run() and then runs on the calling thread, so tests can
+    # decide what has arrived when
+
+    def __init__(self):
+        self.queue = []
+
+    def submit(self, work, on_done=None, on_error=None):
+        future = Future()
+        self.queue.append((future, work, on_done, on_error))
+        return future
+
+    def run(self):
+        while self.queue:
+            future, work, on_done, on_error = self.queue.pop(0)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = work()
+            except Exception as e:
+                on_error(e)
+            else:
+                on_done(result)
+
+class Listing:
+    # a feed's items, newest (highest ID) first, paged by cursor like /api/items
+
+    def __init__(self, item_ids, title='Item'):
+        self.rows = [ItemRow(item_id, 1, f"{title} {item_id}", None, None, 'unread') for item_id in item_ids]
+        self.requests = []
+
+    def fetch_page(self, after):
+        self.requests.append(after)
+        rows = [row for row in self.rows if after is None or row.id < after]
+        return {'list': rows[:PAGE_SIZE], 'has_more': len(rows) > PAGE_SIZE}
+
+def make_loader(listing, **kwargs):
+    tasks = QueuedTasks()
+    loaded = []
+    loader = PagedItemLoader(listing.fetch_page, tasks, lambda page_number, items: loaded.append(page_number), **kwargs)
+    return loader, tasks, loaded
+
+def ids(loader, start, end):
+    return [loader.peek(index).id if loader.peek(index) is not None else None for index in range(start, end)]
+
+def test_pages_load_as_rows_are_drawn():
+    listing = Listing(range(25, 0, -1))
+    loader, tasks, loaded = make_loader(listing)
+    assert loader.item_at(0) is None
+    tasks.run()
+    assert loaded == [0]
+    assert loader.item_at(0).id == 25
+    # one trailing row while there's more, which asks for the next page when it's drawn
+    assert loader.display_count() == PAGE_SIZE + 1
+    assert loader.item_at(PAGE_SIZE) is None
+    tasks.run()
+    assert listing.requests == [None, 16]
+    assert loader.item_at(PAGE_SIZE).id == 15
+
+    loader.item_at(2 * PAGE_SIZE)
+    tasks.run()
+    assert loader.display_count() == 25
+    assert loader.has_more is False
+    assert ids(loader, 18, 25) == [7, 6, 5, 4, 3, 2, 1]
+
+def test_requests_are_not_repeated_while_pending():
+    listing = Listing(range(25, 0, -1))
+    loader, tasks, loaded = make_loader(listing)
+    for _ in range(3):
+        loader.item_at(0)
+    tasks.run()
+    assert listing.requests == [None]
+
+def load_all(loader, tasks):
+    index = 0
+    while loader.has_more or index < loader.row_count:
+        loader.item_at(index)
+        tasks.run()
+        index += 1
+
+def test_pages_fall_out_of_the_cache_and_are_fetched_again():
+    listing = Listing(range(50, 0, -1))
+    loader, tasks, loaded = make_loader(listing, page_cache_size=2)
+    load_all(loader, tasks)
+    assert sorted(loader.pages) == [3, 4]
+    # peek never fetches
+    assert loader.peek(0) is None
+    assert tasks.queue == []
+
+    assert loader.item_at(0) is None
+    tasks.run()
+    assert listing.requests[-1] is None
+    assert loader.item_at(0).id == 50
+    assert sorted(loader.pages) == [0, 4]
+
+def test_no_cache_limit_keeps_every_page():
+    listing = Listing(range(50, 0, -1))
+    loader, tasks, loaded = make_loader(listing, page_cache_size=None)
+    load_all(loader, tasks)
+    assert sorted(loader.pages) == [0, 1, 2, 3, 4]
+    assert [item.id for item in loader.loaded_items()] == list(range(50, 0, -1))
+
+def test_closed_loader_cancels_queued_requests():
+    listing = Listing(range(25, 0, -1))
+    loader, tasks, loaded = make_loader(listing)
+    loader.item_at(0)
+    loader.close()
+    tasks.run()
+    assert listing.requests == []
+    assert loaded == []
+
+def test_failure_is_reported():
+    def fetch_page(after):
+        import requests
+        raise requests.ConnectionError('Yarr is down')
+    tasks = QueuedTasks()
+    loaded = []
+    loader = PagedItemLoader(fetch_page, tasks, lambda page_number, items: loaded.append(page_number))
+    loader.item_at(0)
+    tasks.run()
+    assert loader.failed is True
+    assert loaded == [None]
+    # and nothing more is asked for
+    loader.item_at(0)
+    assert tasks.queue == []
+
+def test_local_first_page_until_yarr_answers():
+    # the local store has an older copy of the feed
+    local = Listing(range(20, 0, -1), title='Local')
+    listing = Listing(range(22, 0, -1))
+    loader, tasks, loaded = make_loader(listing, fetch_local_page=local.fetch_page)
+    loader.load_local_first_page()
+    assert loaded == [0]
+    assert loader.item_at(0).title == 'Local 20'
+    assert loader.provisional is True
+    # carrying on from the local page has to wait for Yarr's first page
+    assert loader.item_at(PAGE_SIZE) is None
+    assert len(tasks.queue) == 1
+
+    tasks.run()
+    assert loader.provisional is False
+    assert listing.requests == [None]
+    assert ids(loader, 0, 3) == [22, 21, 20]
+    assert loader.item_at(0).title == 'Item 22'
+    loader.item_at(PAGE_SIZE)
+    tasks.run()
+    assert listing.requests == [None, 13]
+
+def test_reads_from_the_local_store_once_yarr_is_unreachable():
+    import requests
+    local = Listing(range(25, 0, -1), title='Local')
+    attempts = []
+
+    def fetch_page(after):
+        attempts.append(after)
+        raise requests.ConnectionError('Yarr is down')
+    tasks = QueuedTasks()
+    loader = PagedItemLoader(fetch_page, tasks, lambda page_number, items: None, fetch_local_page=local.fetch_page)
+    load_all(loader, tasks)
+    assert loader.offline is True
+    assert loader.failed is False
+    assert [item.title for item in loader.loaded_items()][:2] == ['Local 25', 'Local 24']
+    assert loader.row_count == 25
+    # Yarr is only tried once
+    assert attempts == [None]
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from json_stream import parse_list_response
+
+RESPONSE = {
+    'has_more': True,
+    'list': [
+        {'id': 3, 'title': 'Café ✓ "quoted" }', 'score': -0.045, 'ratio': 1.5e-7, 'big': 12345678901234,
+         'tags': [1, 2, {'nested': ']'}], 'content': None, 'read': False},
+        {'id': 2, 'title': '', 'score': 10E+2, 'tags': []},
+        {'id': 1, 'title': 'Last', 'score': 0},
+    ],
+    'count': 123,
+    'ratio': -0.045,
+    'scale': 2.5e-3,
+}
+
+def chunked(body, size):
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+@pytest.mark.parametrize('indent', [None, 2])
+@pytest.mark.parametrize('ensure_ascii', [True, False])
+def test_parses_every_chunk_size(indent, ensure_ascii):
+    # numbers, strings and multi-byte characters split at every possible place
+    text = json.dumps(RESPONSE, indent=indent, ensure_ascii=ensure_ascii)
+    body = text.encode('utf-8')
+    expected = json.loads(text)
+    for size in range(1, len(body) + 1):
+        assert parse_list_response(chunked(body, size)) == expected, f"chunk size {size}"
+
+def test_numbers_split_after_the_point_or_exponent():
+    # "12." and "1E" decode as shorter numbers, so these must wait for the rest
+    body = b'{"list": [1, -0.045, 12.5, 1E+2, 3e-4, 0], "has_more": 1.25E1}'
+    expected = json.loads(body)
+    for size in range(1, len(body) + 1):
+        assert parse_list_response(chunked(body, size)) == expected, f"chunk size {size}"
+
+def test_keys_in_any_order():
+    body = b'{"list": [{"id": 1}], "has_more": false}'
+    assert parse_list_response(chunked(body, 3)) == {'list': [{'id': 1}], 'has_more': False}
+
+def test_make_element_is_called_for_each_element():
+    made = []
+    result = parse_list_response([b'{"has_more": false, "list": [{"id": 1}, {"id": 2}]}'], 'list',
+                                 lambda item: made.append(item['id']) or item['id'])
+    assert made == [1, 2]
+    assert result == {'has_more': False, 'list': [1, 2]}
+
+def test_empty_list_and_object():
+    assert parse_list_response([b'{"list": []}']) == {'list': []}
+    assert parse_list_response([b'{}']) == {}
+
+@pytest.mark.parametrize('body', [b'', b'{"list": [1, 2', b'{"list": [1 2]}', b'{"list": [1.]}', b'[1, 2]'])
+def test_malformed_responses_raise(body):
+    with pytest.raises(ValueError):
+        parse_list_response(chunked(body, 1) if body else [])
@@ -0,0 +1,118 @@
+import os
+import time
+
+import pytest
+
+from fake_yarr import FakeYarr
+from feed_model import Folder
+from status_queue import StatusQueue
+from yarr_client import YarrClient
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+@pytest.fixture
+def unreachable_queue(tmp_path):
+    # nothing listens here, so changes stay queued
+    client = YarrClient('http://127.0.0.1:1', timeout=0.5, retries=0)
+    queue = StatusQueue(client, str(tmp_path / 'pending.json'))
+    yield queue
+    queue.shutdown()
+    client.close()
+
+def test_merges_changes(unreachable_queue):
+    queue = unreachable_queue
+    queue.set_item_status(1, 10, 'read')
+    queue.set_item_status(2, 10, 'read')
+    queue.set_item_status(3, 20, 'read')
+    queue.set_item_status(1, 10, 'unread')
+    assert list(queue.pending) == [('item', 2), ('item', 3), ('item', 1)]
+    assert queue.pending_item_status(1) == 'unread'
+    assert queue.pending_item_status(4) is None
+
+    # marking the feed read makes its queued items redundant
+    queue.mark_read('feed', 10, {10})
+    assert list(queue.pending) == [('item', 3), ('feed', 10)]
+
+def test_pending_read_feeds(unreachable_queue):
+    queue = unreachable_queue
+    folder = Folder(5, 'Folder')
+    folder.feed_ids.update({20, 21})
+    queue.set_item_status(1, 30, 'read')
+    queue.mark_read('feed', 10, {10})
+    queue.mark_read('folder', 5, {20, 21})
+    assert queue.pending_read_feed_ids({5: folder}) == {10, 20, 21}
+    # a folder that's gone doesn't cover anything
+    assert queue.pending_read_feed_ids({}) == {10}
+
+def test_saves_to_disk(unreachable_queue):
+    queue = unreachable_queue
+    queue.set_item_status(1, 10, 'read')
+    queue.mark_read('folder', 5, {20, 21})
+    assert StatusQueue.read_pending(queue.queue_file) == queue.pending
+    assert list(StatusQueue.read_pending(queue.queue_file)) == [('item', 1), ('folder', 5)]
+
+def test_replays_saved_changes(tmp_path):
+    queue_file = str(tmp_path / 'pending.json')
+    offline_client = YarrClient('http://127.0.0.1:1', timeout=0.5, retries=0)
+    offline = StatusQueue(offline_client, queue_file)
+    offline.set_item_status(1, 1, 'read')
+    offline.set_item_status(8, 3, 'read')
+    offline.mark_read('feed', 2, {2})
+    offline.shutdown()
+    offline_client.close()
+
+    fake = FakeYarr(folders=1, feeds=3, items_per_feed=5, unread_per_feed=5, distinct_icons=1).start()
+    client = YarrClient(fake.url)
+    queue = StatusQueue(client, queue_file)
+    try:
+        assert wait_for(lambda: not os.path.exists(queue_file))
+        assert fake.items[1]['status'] == 'read'
+        assert fake.items[8]['status'] == 'read'
+        assert all(item['status'] == 'read' for item in fake.items_by_feed[2])
+        assert fake.items[3]['status'] == 'unread'
+    finally:
+        queue.shutdown()
+        client.close()
+        fake.stop()
+
+def test_retries_after_server_errors(tmp_path):
+    fake = FakeYarr(folders=1, feeds=2, items_per_feed=3, unread_per_feed=3, distinct_icons=1).start()
+    client = YarrClient(fake.url, retries=0)
+    queue = StatusQueue(client, str(tmp_path / 'pending.json'))
+    try:
+        fake.fail_next(1)
+        queue.set_item_status(2, 2, 'read')
+        # the first attempt fails and the change is sent again after a backoff
+        assert wait_for(lambda: fake.items[2]['status'] == 'read')
+        assert wait_for(lambda: not queue.pending)
+        assert fake.requests >= 2
+    finally:
+        queue.shutdown()
+        client.close()
+        fake.stop()
+
+def test_new_changes_wait_for_the_backoff(tmp_path):
+    fake = FakeYarr(folders=1, feeds=2, items_per_feed=3, unread_per_feed=3, distinct_icons=1).start()
+    client = YarrClient(fake.url, retries=0)
+    queue = StatusQueue(client, str(tmp_path / 'pending.json'))
+    try:
+        fake.fail_next(1)
+        queue.set_item_status(2, 2, 'read')
+        assert wait_for(lambda: fake.requests == 1)
+        failed_at = time.monotonic()
+        # a change made during the backoff doesn't cut it short
+        queue.set_item_status(3, 2, 'read')
+        assert wait_for(lambda: fake.requests > 1)
+        assert time.monotonic() - failed_at >= 0.9
+        assert wait_for(lambda: not queue.pending)
+        assert fake.items[2]['status'] == fake.items[3]['status'] == 'read'
+    finally:
+        queue.shutdown()
+        client.close()
+        fake.stop()
@@ -0,0 +1,92 @@
+import configparser
+import json
+
+import pytest
+
+import config_management
+from fake_yarr import FakeYarr
+from status_queue import StatusQueue
+from sync import Sync
+
+@pytest.fixture
+def fake():
+    # more unread items per feed than fit on one page, so syncs have to page
+    fake = FakeYarr(folders=2, feeds=6, items_per_feed=40, unread_per_feed=30, distinct_icons=2, content_bytes=200).start()
+    yield fake
+    fake.stop()
+
+@pytest.fixture
+def make_sync(fake, tmp_path, monkeypatch):
+    # the sync keeps its store, caches and snapshot in the working directory, like the app
+    monkeypatch.chdir(tmp_path)
+    config = configparser.ConfigParser()
+    config['Yaffle'] = {'YARR_URL': fake.url, 'offline_store': 'true', 'retries': '0'}
+    syncs = []
+
+    def make_sync():
+        sync = Sync(config['Yaffle'])
+        syncs.append(sync)
+        return sync
+    yield make_sync
+    for sync in syncs:
+        sync.close()
+
+def stored_status(sync, item_id):
+    return sync.article_store.connection.execute('SELECT status FROM items WHERE id = ?', (item_id,)).fetchone()[0]
+
+def test_first_sync(fake, make_sync):
+    sync = make_sync()
+    stats = sync.sync()
+    assert stats == {'feeds': 6, 'items': 6 * 30, 'articles': 6 * 30, 'icons': 6}
+
+    # every unread item is stored with its article, and the app can draw its tree from the snapshot
+    assert sync.article_store.unread_counts() == {feed_id: 30 for feed_id in range(1, 7)}
+    newest = fake.items_by_feed[1][0]
+    assert sync.article_store.get_item(newest['id'])['content'] is not None
+    snapshot = config_management.load_snapshot()
+    assert len(snapshot['feeds']) == 6
+    assert {stats['feed_id']: stats['unread'] for stats in snapshot['stats']} == {feed_id: 30 for feed_id in range(1, 7)}
+
+def test_cursor_stops_paging_at_what_is_already_stored(fake, make_sync):
+    sync = make_sync()
+    sync.sync()
+    requests_before = fake.requests
+    stats = sync.sync()
+    # only each feed's first page is listed, nothing is fetched again, and icons are revalidated rather than sent
+    assert stats == {'feeds': 6, 'items': 6 * 20, 'articles': 0, 'icons': 0}
+    assert fake.requests - requests_before == 3 + 6 + 6
+
+def test_reconciles_items_read_elsewhere(fake, make_sync):
+    sync = make_sync()
+    sync.sync()
+    # an old item read in Yarr's own UI, and all of another feed
+    oldest_unread = fake.items_by_feed[2][29]
+    oldest_unread['status'] = 'read'
+    for item in fake.items_by_feed[3]:
+        item['status'] = 'read'
+
+    sync.sync()
+    assert stored_status(sync, oldest_unread['id']) == 'read'
+    assert stored_status(sync, fake.items_by_feed[2][28]['id']) == 'unread'
+    counts = sync.article_store.unread_counts()
+    assert counts[2] == 29
+    assert 3 not in counts
+
+def test_pending_changes_win_over_yarr(fake, make_sync):
+    # changes the app has queued but not sent yet
+    item = fake.items_by_feed[1][0]
+    with open(StatusQueue.QUEUE_FILE, 'w', encoding='utf-8') as queue_file:
+        json.dump([['item', item['id'], {'status': 'read', 'feed_id': 1}], ['feed', 4, {}]], queue_file)
+
+    sync = make_sync()
+    sync.sync()
+    assert stored_status(sync, item['id']) == 'read'
+    assert stored_status(sync, fake.items_by_feed[1][1]['id']) == 'unread'
+    assert 4 not in sync.article_store.unread_counts()
+    # the sync only reads the queue; sending it is up to the app
+    assert fake.items[item['id']]['status'] == 'unread'
+
+def test_run_reports_failure_when_yarr_is_down(fake, make_sync):
+    sync = make_sync()
+    fake.stop()
+    assert sync.run() is False
@@ -0,0 +1,36 @@
+import json
+
+from tracing import Tracer
+
+def test_spans_are_summarised_and_exported(tmp_path):
+    tracer = Tracer(True, str(tmp_path / 'trace.json'))
+    for _ in range(3):
+        with tracer.span('request', path='/api/items'):
+            pass
+    assert tracer.summary()['request']['count'] == 3
+    tracer.export()
+    with open(tracer.trace_file, encoding='utf-8') as trace_file:
+        events = json.load(trace_file)['traceEvents']
+    assert [event['args'] for event in events if event['ph'] == 'X'] == [{'path': '/api/items'}] * 3
+
+def test_counters_are_reported(tmp_path, capsys):
+    tracer = Tracer(True, str(tmp_path / 'trace.json'))
+    tracer.set_counters('article cache', {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3, 'label': 'ignored'})
+    tracer.print_summary()
+    assert 'article cache: hits 2, misses 1, hit_rate 0.67' in capsys.readouterr().out
+    tracer.export()
+    with open(tracer.trace_file, encoding='utf-8') as trace_file:
+        events = json.load(trace_file)['traceEvents']
+    [counter] = [event for event in events if event['ph'] == 'C']
+    assert counter['name'] == 'article cache'
+    assert counter['args'] == {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3}
+
+def test_nothing_is_kept_when_disabled(tmp_path, capsys):
+    tracer = Tracer(False, str(tmp_path / 'trace.json'))
+    with tracer.span('request'):
+        pass
+    tracer.set_counters('article cache', {'hits': 1})
+    tracer.print_summary()
+    tracer.export()
+    assert capsys.readouterr().out == ''
+    assert not (tmp_path / 'trace.json').exists()
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from worker_pool import WorkerPool
+
+def test_runs_work_and_reports_results():
+    pool = WorkerPool(2)
+    assert pool.submit(lambda a, b: a + b, 1, b=2).result(5) == 3
+    failed = pool.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failed.result(5)
+    pool.shutdown()
+
+def test_never_starts_more_threads_than_allowed():
+    pool = WorkerPool(2)
+    release = threading.Event()
+    futures = [pool.submit(release.wait, 5) for _ in range(5)]
+    assert len(pool.threads) == 2
+    release.set()
+    assert all(future.result(5) for future in futures)
+    # finished workers are reused
+    pool.submit(time.sleep, 0).result(5)
+    assert len(pool.threads) == 2
+    pool.shutdown()
+
+def test_shutdown_waits_for_queued_work_unless_cancelled():
+    pool = WorkerPool(1)
+    release = threading.Event()
+    running = pool.submit(release.wait, 5)
+    queued = [pool.submit(time.sleep, 0) for _ in range(3)]
+    release.set()
+    pool.shutdown(wait=True)
+    assert running.result() is True
+    assert all(future.done() and not future.cancelled() for future in queued)
+
+    pool = WorkerPool(1)
+    release = threading.Event()
+    running = pool.submit(release.wait, 5)
+    queued = [pool.submit(time.sleep, 0) for _ in range(3)]
+    pool.shutdown(wait=False, cancel_futures=True)
+    assert all(future.cancelled() for future in queued)
+    release.set()
+    assert running.result(5) is True
+    with pytest.raises(RuntimeError):
+        pool.submit(time.sleep, 0)
+
+def test_work_in_progress_does_not_hold_up_exit():
+    # a ThreadPoolExecutor would keep the process alive until the sleep finished
+    script = ("import time\n"
+              "from worker_pool import WorkerPool\n"
+              "pool = WorkerPool(2)\n"
+              "pool.submit(time.sleep, 10)\n"
+              "time.sleep(0.1)\n"
+              "pool.shutdown(wait=False, cancel_futures=True)\n")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', script], check=True, timeout=20,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert time.perf_counter() - start < 5
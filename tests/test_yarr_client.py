@@ -0,0 +1,72 @@
+import time
+
+import pytest
+import requests
+
+from fake_yarr import FakeYarr
+from yarr_client import YarrClient
+
+@pytest.fixture
+def fake():
+    fake = FakeYarr(folders=2, feeds=5, items_per_feed=30, unread_per_feed=25, distinct_icons=1, content_bytes=100).start()
+    yield fake
+    fake.stop()
+
+def test_retries_server_errors(fake):
+    client = YarrClient(fake.url, retries=2)
+    fake.fail_next(1)
+    assert len(client.get_feeds()) == 5
+    assert fake.requests == 2
+    client.close()
+
+def test_gives_up_after_retries(fake):
+    client = YarrClient(fake.url, retries=1)
+    fake.fail_next(2)
+    with pytest.raises(requests.HTTPError):
+        client.get_folders()
+    # the next call gets through
+    assert len(client.get_folders()) == 2
+    client.close()
+
+def test_does_not_retry_client_errors(fake):
+    client = YarrClient(fake.url, retries=2)
+    fake.fail_next(1, status=404)
+    with pytest.raises(requests.HTTPError):
+        client.get_item(1)
+    assert fake.requests == 1
+    client.close()
+
+def test_times_out():
+    fake = FakeYarr(folders=1, feeds=1, items_per_feed=1, distinct_icons=1, latency_ms=1000).start()
+    client = YarrClient(fake.url, timeout=0.2, retries=0)
+    start = time.perf_counter()
+    try:
+        with pytest.raises(requests.RequestException):
+            client.get_status()
+        assert time.perf_counter() - start < 0.9
+    finally:
+        client.close()
+        fake.stop()
+
+def test_streams_items_through_make_item(fake):
+    client = YarrClient(fake.url)
+    data = client.get_items(feed_id=3, status='unread', make_item=lambda item: (item['id'], item['feed_id']))
+    assert data['has_more'] is True
+    assert len(data['list']) == 20
+    assert all(feed_id == 3 for _, feed_id in data['list'])
+    ids = [item_id for item_id, _ in data['list']]
+    assert ids == sorted(ids, reverse=True)
+
+    rest = client.get_items(feed_id=3, status='unread', after=ids[-1])
+    assert rest['has_more'] is False
+    assert [item['id'] for item in rest['list']] == [item['id'] for item in fake.items_by_feed[3][20:25]]
+    client.close()
+
+def test_sends_status_changes(fake):
+    client = YarrClient(fake.url)
+    client.update_item_status(1, 'unread')
+    assert fake.items[1]['status'] == 'unread'
+    client.mark_items_read(feed_id=2)
+    assert all(item['status'] == 'read' for item in fake.items_by_feed[2])
+    assert any(item['status'] == 'unread' for item in fake.items_by_feed[3])
+    client.close()
@@ -0,0 +1,146 @@
+import functools
+import json
+import os
+import threading
+import time
+
+class Tracer:
+
+    TRACE_FILE = 'yaffle-trace.json'
+    # enough for a long session; after this, spans are still counted in the summary but not kept for the trace
+    MAX_EVENTS = 200000
+
+    def __init__(self, enabled=False, trace_file=TRACE_FILE):
+        # when disabled, span() hands back a shared do-nothing context manager, so instrumented code costs
+        # one attribute lookup and an empty with block
+        self.enabled = enabled
+        self.trace_file = trace_file
+        self.start_ns = time.perf_counter_ns()
+        self.events = []
+        self.durations = {} # span name -> list of durations in seconds
+        self.thread_names = {}
+        self.counters = {} # name -> {counter: value}, e.g. a cache's hits and misses
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.getboolean('tracing', fallback=False),
+                   config.get('trace_file', fallback=cls.TRACE_FILE))
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def record(self, name, start_ns, end_ns, args=None):
+        # for spans that don't fit in a with block, e.g. ones that start before the tracer exists
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        with self.lock:
+            self.durations.setdefault(name, []).append((end_ns - start_ns) / 1e9)
+            if len(self.events) < self.MAX_EVENTS:
+                self.thread_names.setdefault(thread.ident, thread.name)
+                # Chrome's trace event format: a complete ('X') event with timestamps in microseconds
+                event = {'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': thread.ident,
+                         'ts': (start_ns - self.start_ns) / 1000, 'dur': (end_ns - start_ns) / 1000}
+                if args:
+                    event['args'] = args
+                self.events.append(event)
+
+    def set_counters(self, name, values):
+        # totals kept elsewhere (e.g. by a cache), reported alongside the spans; only numbers make sense in a trace
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = {key: value for key, value in values.items() if isinstance(value, (int, float))}
+            if len(self.events) < self.MAX_EVENTS:
+                # a Chrome counter ('C') event, drawn as a graph track
+                self.events.append({'name': name, 'ph': 'C', 'pid': os.getpid(),
+                                    'ts': (time.perf_counter_ns() - self.start_ns) / 1000,
+                                    'args': self.counters[name]})
+
+    def summary(self):
+        with self.lock:
+            durations = {name: sorted(values) for name, values in self.durations.items()}
+        return {name: {'count': len(values),
+                       'p50_ms': percentile(values, 0.50) * 1000,
+                       'p95_ms': percentile(values, 0.95) * 1000,
+                       'max_ms': values[-1] * 1000}
+                for name, values in durations.items()}
+
+    def print_summary(self):
+        if not self.enabled:
+            return
+        for name, stats in sorted(self.summary().items()):
+            print(f"{name}: {stats['count']} calls, p50 {stats['p50_ms']:.1f}ms, p95 {stats['p95_ms']:.1f}ms, "
+                  f"max {stats['max_ms']:.1f}ms")
+        with self.lock:
+            counters = dict(self.counters)
+        for name, values in sorted(counters.items()):
+            print(f"{name}: " + ', '.join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}"
+                                          for key, value in values.items()))
+
+    def export(self):
+        # open the file in chrome://tracing or https://ui.perfetto.dev
+        if not self.enabled:
+            return
+        with self.lock:
+            metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': ident, 'args': {'name': name}}
+                        for ident, name in self.thread_names.items()]
+            trace = {'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}
+        try:
+            temp_path = self.trace_file + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as trace_file:
+                json.dump(trace, trace_file)
+            os.replace(temp_path, self.trace_file)
+            print(f"Trace written to {self.trace_file}")
+        except OSError as e:
+            print(f"Failed to write trace: {e}")
+
+class Span:
+
+    __slots__ = ('tracer', 'name', 'args', 'start_ns')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start_ns = None
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.record(self.name, self.start_ns, time.perf_counter_ns(), self.args)
+        return False
+
+class NullSpan:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_SPAN = NullSpan()
+
+def traced(name):
+    # wraps a method of anything with a tracer attribute in a span
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.tracer.enabled:
+                return method(self, *args, **kwargs)
+            with self.tracer.span(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+def percentile(ordered_values, fraction):
+    return ordered_values[min(len(ordered_values) - 1, int(len(ordered_values) * fraction))]
@@ -0,0 +1,65 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+class WorkerPool:
+
+    # A cut-down ThreadPoolExecutor whose threads are daemons. Python waits at exit for every ThreadPoolExecutor
+    # worker to finish what it's doing, even after shutdown(wait=False), so a single slow request (Yarr's timeout
+    # times every retry, or an image host that never answers) would keep the process alive long after the
+    # window has closed. What runs here is best-effort, so anything unfinished at exit is simply abandoned.
+    def __init__(self, max_workers, thread_name_prefix='worker'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self.work_queue = queue.SimpleQueue()
+        self.threads = []
+        # released by each worker as it finishes something, so a new thread is only started when none is free
+        self.idle = threading.Semaphore(0)
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def submit(self, fn, *args, **kwargs):
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('cannot submit after shutdown')
+            future = Future()
+            self.work_queue.put((future, fn, args, kwargs))
+            if not self.idle.acquire(blocking=False) and len(self.threads) < self.max_workers:
+                thread = threading.Thread(target=self.run, name=f"{self.thread_name_prefix}_{len(self.threads)}",
+                                          daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            return future
+
+    def run(self):
+        while True:
+            work = self.work_queue.get()
+            if work is None:
+                return
+            future, fn, args, kwargs = work
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            del work, future, fn, args, kwargs
+            self.idle.release()
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self.lock:
+            self.closed = True
+            if cancel_futures:
+                while True:
+                    try:
+                        work = self.work_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    work[0].cancel()
+            # one stop marker per worker, queued behind anything that's left to do
+            for _ in self.threads:
+                self.work_queue.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
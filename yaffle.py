@@ -1,33 +1,80 @@
-import ctypes
+import time
+IMPORTS_START_NS = time.perf_counter_ns()
+
+import hashlib
 import os
 import sys
-from AppKit import NSApplication, NSImage
-from Foundation import NSURL
-from io import BytesIO
-from datetime import datetime
 from functools import partial
 import webbrowser
 
+# `yaffle sync` keeps the local caches up to date without a window, so it's handled before wx is even imported
+if __name__ == '__main__' and sys.argv[1:2] == ['sync']:
+    import sync
+    sys.exit(sync.main(sys.argv[2:]))
+
 import wx
-import wx.adv
-import wx.html2
-import requests
+WX_IMPORTED_NS = time.perf_counter_ns()
 
+# Pillow, requests and wx.html2 are slow to import and aren't needed to put the window on screen, so the
+# modules that use them import them when they're first needed, mostly on worker threads
 from icon_processing import IconProcessing
+from icon_loader import IconLoader
+from icon_cache import IconCache
+from yarr_client import YarrClient
+from background_tasks import BackgroundTasks
+from feed_model import FeedModel, Folder, Feed, River
+from item_list import ItemListCtrl, ItemRow, PagedItemLoader, get_item_title
+from content_cache import ContentCache, ContentPrefetcher
+from image_cache import ImageCache, ImagePrefetcher
+from status_queue import StatusQueue
+from article_store import ArticleStore
 import config_management
+from tracing import Tracer, traced
+IMPORTS_DONE_NS = time.perf_counter_ns()
 
-try:
-    ctypes.windll.shcore.SetProcessDpiAwareness(True)
-except:
-    pass
+if sys.platform == 'win32':
+    import ctypes
+    try:
+        ctypes.windll.shcore.SetProcessDpiAwareness(True)
+    except:
+        pass
 
 class YaffleFrame(wx.Frame):
 
-    def __init__(self):
+    # after an article is opened, this many items either side of it are fetched in the background...
+    PREFETCH_NEIGHBOURS = 3
+    # ...along with the first few unread items in the feed
+    PREFETCH_UNREAD = 5
+    # where --profile-startup writes its report
+    STARTUP_REPORT_FILE = 'yaffle-startup.txt'
+
+    def __init__(self, profile_startup=False):
+        startup_ns = time.perf_counter_ns()
 
         config = config_management.load_config()
+        # optional spans around API calls and UI work, written out as a Chrome trace on exit
+        self.tracer = Tracer.from_config(config)
+        if profile_startup:
+            self.tracer.enabled = True
         self.YARR_URL = config['YARR_URL']
         self.STARTING_FEED = config['selected_feed']
+        self.yarr_client = YarrClient.from_config(config, self.tracer)
+        # item lists and articles are fetched here so the event loop never waits on Yarr
+        self.background_tasks = BackgroundTasks()
+        self.pending_item_id = None
+        self.content_cache = ContentCache()
+        self.content_prefetcher = ContentPrefetcher(self.fetch_item, self.content_cache)
+        # images in articles are kept on disk as articles are fetched, so reopening one doesn't download them again
+        self.image_cache = ImageCache()
+        self.image_prefetcher = ImagePrefetcher(self.image_cache)
+        # optional local copy of everything fetched, so reading carries on when Yarr is slow or unreachable
+        self.article_store = ArticleStore.from_config(config)
+        if self.article_store is not None:
+            self.background_tasks.submit(self.article_store.apply_retention)
+        # read/unread changes show in the UI straight away and are sent to Yarr in the background
+        self.status_queue = StatusQueue(self.yarr_client)
+        # folders, feeds, unread counts and item read state; the tree and item list are views of this
+        self.model = FeedModel()
 
         # Need this for PyInstaller to find the images
         if getattr(sys, 'frozen', False):
@@ -37,6 +84,8 @@ class YaffleFrame(wx.Frame):
             # we are running in a normal Python environment
             bundle_dir = os.path.dirname(os.path.abspath(__file__))
 
+        services_ns = time.perf_counter_ns()
+        self.tracer.record('startup: config and services', startup_ns, services_ns)
         super().__init__(parent=None, title='Yaffle')
 
         # Set the size based on the "dimensions" parameter in the config file if it exists
@@ -61,6 +110,8 @@ class YaffleFrame(wx.Frame):
 
         # Set the dock icon on macOS
         if sys.platform == 'darwin':
+            from AppKit import NSApplication, NSImage
+            from Foundation import NSURL
             app = NSApplication.sharedApplication()
             icon_path = os.path.join(bundle_dir, 'yaffle.png')
             icon_url = NSURL.fileURLWithPath_(icon_path)
@@ -80,68 +131,148 @@ class YaffleFrame(wx.Frame):
 
         toolbar = self.CreateToolBar(style=wx.TB_HORIZONTAL | wx.NO_BORDER | wx.TB_FLAT | wx.TB_HORZ_TEXT)
         toolbar.AddTool(100, 'Show all feeds/show unread', wx.ArtProvider.GetBitmap(wx.ART_NEW_DIR, wx.ART_TOOLBAR))
-        # each folder has a read/unread state, then when clicking the button it filters the items in the selected folder and uses the per-folder flag to show/hide the rest
-        # wx doesn't have a way of changing tree item visibility so tree needs to be deleted and rebuilt (or switch between two trees)
-        # probably loop through all items and remove feeds that are read, putting them into a different in-memory array
-        # then when the button is clicked, rebuild the tree with the in-memory array, and implement OnCompareItems so we can sort the tree
-        # starting status needs to be saved too and work with either selected, so all feeds still need to be fetched at startup, but filter needs to apply if it's unread only
+        # wx doesn't have a way of changing tree item visibility, so filtering deletes and re-inserts just the
+        # nodes whose visibility changes (see apply_feed_filter) rather than rebuilding the tree
+        self.show_unread_only = config.getboolean('show_unread_only', fallback=False)
+        self.Bind(wx.EVT_TOOL, self.on_toggle_unread_filter, id=100)
 
         toolbar.AddTool(101, 'Add subscription', wx.ArtProvider.GetBitmap(wx.ART_PLUS, wx.ART_TOOLBAR))
+
+        # search runs against the local article store, so it needs offline_store turned on
+        self.search_ctrl = wx.SearchCtrl(toolbar, size=(300, -1), style=wx.TE_PROCESS_ENTER)
+        self.search_ctrl.ShowCancelButton(True)
+        self.search_ctrl.SetDescriptiveText('Search articles')
+        toolbar.AddControl(self.search_ctrl)
+        self.search_ctrl.Bind(wx.EVT_TEXT, self.on_search_text)
+        self.search_ctrl.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.on_search_cancel)
+        self.search_timer = None
+        if self.article_store is None or not self.article_store.search_available:
+            self.search_ctrl.Disable()
         # toolbar.AddTool(103, 'Show starred', wx.ArtProvider.GetBitmap(wx.ART_FILE_SAVE, wx.ART_TOOLBAR))
         # toolbar.AddTool(103, 'Update feeds', wx.ArtProvider.GetBitmap(wx.ART_REDO, wx.ART_TOOLBAR))
         toolbar.Realize()
 
         # Add tree control and root
-        self.feed_tree = wx.TreeCtrl(feed_tree_splitter, style=wx.TR_HIDE_ROOT | wx.TR_NO_LINES | wx.TR_HAS_BUTTONS | wx.TR_FULL_ROW_HIGHLIGHT)
+        # several feeds and folders can be selected (with ctrl/shift-click) to mark them all as read at once
+        self.feed_tree = wx.TreeCtrl(feed_tree_splitter, style=wx.TR_HIDE_ROOT | wx.TR_NO_LINES | wx.TR_HAS_BUTTONS | wx.TR_FULL_ROW_HIGHLIGHT | wx.TR_MULTIPLE)
         self.feed_tree.SetBackgroundColour(wx.Colour(249, 255, 249))
         self.feed_tree.AssignImageList(self.create_feed_image_list(bundle_dir))
+        # hash of an icon's pixels -> its index in the image list
+        self.icon_slots = {}
+        # feed ID -> the image list index of its icon, so a feed the unread filter hides and shows again gets its
+        # icon back without reading the cache or asking Yarr; and the feeds whose icons have been asked for
+        self.feed_icons = {}
+        self.requested_icons = set()
         self.feed_tree.SetIndent(48)
         self.feed_tree.AddRoot('Root')
+        self.icon_cache = IconCache()
+        self.icon_loader = IconLoader(self.yarr_client, self.icon_cache, self.on_icon_loaded, self.tracer)
 
         # Create another splitter window for the list control and HTML window
-        right_splitter = wx.SplitterWindow(feed_tree_splitter)
+        self.right_splitter = wx.SplitterWindow(feed_tree_splitter)
 
         # Set the item list as the top window of the splitter
-        self.item_list = wx.ListCtrl(right_splitter, style=wx.LC_REPORT)
+        self.item_list = ItemListCtrl(self.right_splitter, self.model)
         self.item_list.InsertColumn(0, 'Title')
 
-        self.web_view = wx.html2.WebView.New(right_splitter)
-        self.web_view.Bind(wx.html2.EVT_WEBVIEW_NAVIGATING, self.on_webview_navigating)
-        self.web_view.Bind(wx.html2.EVT_WEBVIEW_NEWWINDOW, self.on_webview_navigating) # catches links with target="_blank"
-
-        # Set the HTML window as the bottom window of the splitter
-        right_splitter.SplitHorizontally(self.item_list, self.web_view)
-        right_splitter.SetSashPosition(600)  # Set the height of the list control to 300 pixels
+        # the web view is the slowest widget to create, so it's left until the first article is opened
+        self.web_view = None
+        self.article_renderer = None
+        self.right_splitter.Initialize(self.item_list)
 
-        feed_tree_splitter.SplitVertically(self.feed_tree, right_splitter, 600)
+        feed_tree_splitter.SplitVertically(self.feed_tree, self.right_splitter, 600)
         feed_tree_splitter.AlwaysShowScrollbars(False, True)
 
         self.feed_tree.Bind(wx.EVT_LEFT_DOWN, self.on_tree_item_activated)
         self.feed_tree.Bind(wx.EVT_SIZE, self.on_feed_list_resize)
         self.feed_tree.Bind(wx.EVT_TREE_SEL_CHANGED, self.on_feed_tree_item_selected)
         self.feed_tree.Bind(wx.EVT_TREE_ITEM_RIGHT_CLICK, self.on_tree_item_right_click)
+        # the context menu's handler is bound once; the menu records which feeds it was opened for
+        self.mark_read_menu_id = wx.NewIdRef()
+        self.Bind(wx.EVT_MENU, self.on_mark_read_menu_item, id=self.mark_read_menu_id)
+        self.context_menu_feed_ids = set()
 
         self.item_list.Bind(wx.EVT_SIZE, self.on_item_list_resize)
         self.item_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_feed_item_selected)
 
-        # fetch the status so we know which feeds to mark as bold on startup
-        self.feed_status = self.get_feed_status()
-        self.initialise_feed_tree()
+        widgets_ns = time.perf_counter_ns()
+        self.tracer.record('startup: widgets', services_ns, widgets_ns)
+
+        # draw the tree from the last session's snapshot straight away, without waiting for Yarr,
+        # then bring it up to date in the background
+        self.feed_tree_items = {}
+        self.folder_tree_items = {FeedModel.ROOT_FOLDER_ID: self.feed_tree.GetRootItem()}
+        self.river_tree_item = None
+        snapshot = config_management.load_snapshot()
+        if snapshot is not None:
+            self.model.load(snapshot['folders'], snapshot['feeds'], snapshot)
+            self.STARTING_FEED = snapshot.get('selected_feed', self.STARTING_FEED)
+            self.initialise_feed_tree()
+        self.refresh_feeds()
+        self.tracer.record('startup: snapshot', widgets_ns, time.perf_counter_ns())
+
+        # keep unread counts and the feed list current; 0 turns polling off
+        self.refresh_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_refresh_timer, self.refresh_timer)
+        refresh_interval = config.getint('refresh_interval', fallback=300)
+        if refresh_interval > 0:
+            self.refresh_timer.Start(refresh_interval * 1000)
+
+        self.tracer.record('startup', startup_ns, time.perf_counter_ns())
+
+    def report_startup(self):
+        # --profile-startup: called on the first turn of the event loop, once the window is up
+        first_turn_ns = time.perf_counter_ns()
+        lines = [f"import wx: {(WX_IMPORTED_NS - IMPORTS_START_NS) / 1e6:.1f}ms",
+                 f"import Yaffle modules: {(IMPORTS_DONE_NS - WX_IMPORTED_NS) / 1e6:.1f}ms"]
+        summary = self.tracer.summary()
+        for name in ('startup: config and services', 'startup: widgets', 'startup: snapshot', 'startup'):
+            if name in summary:
+                lines.append(f"{name}: {summary[name]['max_ms']:.1f}ms")
+        lines.append(f"first event loop turn: {(first_turn_ns - IMPORTS_START_NS) / 1e6:.1f}ms after imports started")
+        deferred = [name for name in ('PIL', 'requests', 'wx.html2', 'AppKit') if name not in sys.modules]
+        lines.append(f"not imported yet: {', '.join(deferred) or 'none'}")
+        # the frozen exe has no console to print to, so the report always goes to a file as well
+        try:
+            with open(self.STARTUP_REPORT_FILE, 'w', encoding='utf-8') as report_file:
+                report_file.write('\n'.join(lines) + '\n')
+        except OSError as e:
+            lines.append(f"Failed to write {self.STARTUP_REPORT_FILE}: {e}")
+        if sys.stdout is not None:
+            print('\n'.join(lines))
+        self.Close()
+
+    def create_article_view(self):
+        import wx.html2
+        from article_renderer import ArticleRenderer
+        self.article_renderer = ArticleRenderer.create(self.right_splitter, self.yarr_client, self.background_tasks,
+                                                       self.image_cache)
+        self.web_view = self.article_renderer.web_view
+        self.web_view.Bind(wx.html2.EVT_WEBVIEW_NAVIGATING, self.on_webview_navigating)
+        self.web_view.Bind(wx.html2.EVT_WEBVIEW_NEWWINDOW, self.on_webview_navigating) # catches links with target="_blank"
+
+        # Set the HTML window as the bottom window of the splitter
+        self.right_splitter.SplitHorizontally(self.item_list, self.web_view, 600)
 
     def on_exit(self, event):
+        self.refresh_timer.Stop()
+        self.background_tasks.shutdown()
+        self.content_prefetcher.shutdown()
+        self.image_prefetcher.shutdown()
+        self.image_cache.save()
+        self.status_queue.shutdown()
+        if self.article_store is not None:
+            self.article_store.close()
+        self.icon_loader.shutdown()
+        self.icon_cache.save()
+        self.tracer.set_counters('article cache', self.content_cache.stats())
+        self.tracer.export()
+        self.tracer.print_summary()
+        self.yarr_client.close()
         config_management.save_config(self)
+        config_management.save_snapshot(self)
         self.Destroy()
 
-    def get_feed_status(self):
-        print(f"Fetching status from {self.YARR_URL}")
-        response = requests.get(f"{self.YARR_URL}/api/status")
-        if response.status_code == 200:
-            data = response.json()
-            return data
-        else:
-            print(f"Failed to fetch status: {response.status_code}")
-            self.on_exit(wx.EVT_CLOSE)
-
     def on_feed_list_resize(self, event):
         # self.feed_list.SetColumnWidth(0, self.feed_list.GetSize()[0])
         event.Skip()
@@ -152,73 +283,298 @@ class YaffleFrame(wx.Frame):
 
     def create_feed_image_list(self, bundle_dir):
         # Load a default RSS icon and put it in the feed image list
-        rss_image_path = os.path.join(bundle_dir, 'rss-32.png')
-        rss_image = wx.Image(rss_image_path, wx.BITMAP_TYPE_PNG)
-
-        rss_image = IconProcessing.load_and_pad_image(rss_image_path)
+        rss_image = IconProcessing.load_and_pad_image(os.path.join(bundle_dir, 'rss-32.png'))
 
         feed_image_list = wx.ImageList(IconProcessing.ICON_SIZE[0], IconProcessing.ICON_SIZE[1])
-        feed_image_list.Add(wx.Bitmap(rss_image))
+        feed_image_list.Add(rss_image)
         feed_image_list.Add(wx.ArtProvider.GetBitmap(wx.ART_FOLDER, wx.ART_OTHER, IconProcessing.ICON_SIZE))
+        feed_image_list.Add(wx.ArtProvider.GetBitmap(wx.ART_LIST_VIEW, wx.ART_OTHER, IconProcessing.ICON_SIZE))
         return feed_image_list
 
-    def process_icon(self, item):
-        icon_response = requests.get(f"{self.YARR_URL}/api/feeds/{item['id']}/icon")
-        if 'image' in icon_response.headers['Content-Type']:
-            icon_stream = BytesIO(icon_response.content)
-            image = IconProcessing.load_and_pad_image(icon_stream)
-            return image
+    def on_icon_loaded(self, feed_id, rgba):
+        # icons arrive from the loader's worker threads via wx.CallAfter, possibly after the frame has gone
+        if not self:
+            return
+        self.set_feed_icon(feed_id, rgba)
+
+    @traced('icon display')
+    def set_feed_icon(self, feed_id, rgba):
+        # lots of feeds share an icon (every Substack, for example), so identical icons share one image list slot.
+        # The slot is remembered even if the feed is hidden by the unread filter right now.
+        icon_hash = hashlib.sha1(rgba).digest()
+        icon_index = self.icon_slots.get(icon_hash)
+        if icon_index is None:
+            icon_index = self.feed_tree.GetImageList().Add(IconProcessing.bitmap_from_rgba(rgba))
+            self.icon_slots[icon_hash] = icon_index
+        self.feed_icons[feed_id] = icon_index
+        feed_item_id = self.feed_tree_items.get(feed_id)
+        if feed_item_id is not None:
+            self.feed_tree.SetItemImage(feed_item_id, icon_index)
+
+    def refresh_feeds(self):
+        # fetch folders, feeds and unread counts in the background and apply whatever has changed to the tree
+        self.background_tasks.submit_latest('feeds', self.fetch_feed_state, self.on_feed_state_loaded, self.on_feed_state_failed)
+
+    def fetch_feed_state(self):
+        print(f"Fetching status from {self.YARR_URL}")
+        return self.yarr_client.get_folders(), self.yarr_client.get_feeds(), self.yarr_client.get_status()
+
+    def on_refresh_timer(self, event):
+        self.refresh_feeds()
+
+    def on_feed_state_failed(self, error):
+        # keep showing the snapshot (or nothing) rather than giving up
+        print(f"Failed to fetch feeds: {error}")
+
+    def on_feed_state_loaded(self, feed_state):
+        folder_data, feed_data, status_data = feed_state
+        if self.article_store is not None:
+            self.background_tasks.submit(partial(self.article_store.replace_folders_and_feeds, folder_data, feed_data))
+        if not self.model.feeds:
+            # nothing on screen yet (first run, or no snapshot), so just build the whole tree
+            self.model.load(folder_data, feed_data, status_data)
+            self.initialise_feed_tree()
         else:
-            print(f"C Failed to load image for feed {item['id']}. Unknown image data format.")
-            return None
+            changes = self.model.update(folder_data, feed_data, status_data)
+            self.apply_model_changes(changes)
+            if self.show_unread_only and not changes.is_empty():
+                self.apply_feed_filter()
 
-    def initialise_feed_tree(self):
-        folder_response = requests.get(f"{self.YARR_URL}/api/folders")
-        folder_data = folder_response.json()
-        folder_dict = {0: self.feed_tree.GetRootItem()} # create a dict to hold the folder items. First item is the root
-
-        for index, folder in enumerate(folder_data):
-            # put the API-provided folder ID in the item data so we can use it to fetch feeds later
-            folder_item_id = self.feed_tree.AppendItem(self.feed_tree.GetRootItem(), folder['title'], 1, -1, folder['id'])
-            # we don't currently support restoring selection of a folder on exit - would need to change ItemData to denote folder or feed selected
-            folder_dict[folder['id']] = folder_item_id
+        self.icon_cache.evict_unsubscribed({feed.id for feed in self.model.feeds.values() if feed.has_icon})
 
-        feed_response = requests.get(f"{self.YARR_URL}/api/feeds")
-        feed_data = feed_response.json()
+    @traced('tree build')
+    def initialise_feed_tree(self):
+        # the tree is a view of the model: each node's item data is the Folder or Feed it shows
+        self.feed_tree.DeleteChildren(self.feed_tree.GetRootItem())
+        self.feed_tree_items = {}
+        self.folder_tree_items = {FeedModel.ROOT_FOLDER_ID: self.feed_tree.GetRootItem()}
+        # "All unread" always comes first, and stays visible when the tree only shows unread feeds
+        self.river_tree_item = self.feed_tree.AppendItem(self.feed_tree.GetRootItem(), self.model.river.title, 2, -1,
+                                                         self.model.river)
+        self.refresh_tree_node(self.model.river)
+        # with the unread filter on, only what it will show is added, so hidden feeds don't have their icons loaded
+        starting_feed = self.model.feeds.get(int(self.STARTING_FEED))
+        for folder in self.model.folders.values():
+            if folder.id != FeedModel.ROOT_FOLDER_ID and self.is_node_visible(folder, starting_feed):
+                self.folder_tree_items[folder.id] = self.feed_tree.AppendItem(self.feed_tree.GetRootItem(), folder.title, 1, -1, folder)
+                self.refresh_tree_node(folder)
 
         # Add each feed to the correct folder with the correct icon
-        for index, item in enumerate(feed_data):
-            icon_index = 0 # the default RSS icon
-            if item['has_icon'] is True:
-                icon = self.process_icon(item)
-                if icon:
-                    icon_index = self.feed_tree.GetImageList().Add(icon)
-
-            if item['folder_id'] is None:
-                item['folder_id'] = 0
-
-            feed_item_id = self.feed_tree.AppendItem(folder_dict[item['folder_id']], str(item['title']).strip(), icon_index, -1, item['id'])
+        for feed in self.model.feeds.values():
+            if feed.folder_id not in self.folder_tree_items or not self.is_node_visible(feed, starting_feed):
+                continue
+            feed_item_id = self.feed_tree.AppendItem(self.folder_tree_items[feed.folder_id], feed.title, 0, -1, feed)
+            self.add_feed_node(feed, feed_item_id)
             # if this was the feed that was selected when the app was last closed, select it
-            if(item['id'] == int(self.STARTING_FEED)):
-                self.feed_tree.SelectItem(feed_item_id)
-
-            # if the feed has unread items, make it bold
-            if item['id'] in self.get_unread_feed_ids():
-                self.feed_tree.SetItemFont(feed_item_id, self.feed_tree.GetFont().Bold())
+            if(feed.id == int(self.STARTING_FEED)):
+                self.select_tree_item(feed_item_id)
 
         self.feed_tree.ExpandAll()
+        if self.show_unread_only:
+            self.apply_feed_filter()
 
-        if(self.feed_tree.GetSelection().IsOk() is not True):
-            self.feed_tree.SelectItem(self.feed_tree.GetFirstChild(self.feed_tree.GetRootItem())[0])
+        if(self.get_current_tree_item().IsOk() is not True):
+            first_item = self.feed_tree.GetFirstChild(self.feed_tree.GetRootItem())[0]
+            if not first_item.IsOk():
+                return
+            self.select_tree_item(first_item)
 
         # Scroll the selected item into view and make sure it's in a reasonable place on screen
-        self.feed_tree.EnsureVisible(self.feed_tree.GetSelection())
-        rect = self.feed_tree.GetBoundingRect(self.feed_tree.GetSelection(), textOnly=True)
+        self.feed_tree.EnsureVisible(self.get_current_tree_item())
+        rect = self.feed_tree.GetBoundingRect(self.get_current_tree_item(), textOnly=True)
         if(rect.y > (0.8)*self.GetSize().height):
             self.feed_tree.ScrollLines(10)
 
-    def get_unread_feed_ids(self):
-        return [item['feed_id'] for item in self.feed_status['stats'] if item['unread'] > 0]
+    def add_feed_node(self, feed, feed_item_id):
+        self.feed_tree_items[feed.id] = feed_item_id
+        self.refresh_tree_node(feed)
+        icon_index = self.feed_icons.get(feed.id)
+        if icon_index is not None:
+            self.feed_tree.SetItemImage(feed_item_id, icon_index)
+        elif feed.has_icon and feed.id not in self.requested_icons:
+            # start with the cached icon if we have one, otherwise the default RSS icon
+            # either way the loader revalidates in the background and on_icon_loaded swaps in anything new
+            self.requested_icons.add(feed.id)
+            cached_icon = self.icon_cache.get(feed.id)
+            if cached_icon is not None:
+                self.set_feed_icon(feed.id, cached_icon)
+            self.icon_loader.load(feed.id)
+
+    @traced('tree update')
+    def apply_model_changes(self, changes):
+        # update only the nodes that changed, so expansion, selection and scroll position are left alone
+        if changes.is_empty():
+            return
+        selected_node = self.get_selected_node()
+
+        for feed in changes.removed_feeds:
+            feed_item_id = self.feed_tree_items.pop(feed.id, None)
+            if feed_item_id is not None:
+                self.feed_tree.Delete(feed_item_id)
+
+        for folder in changes.added_folders:
+            self.folder_tree_items[folder.id] = self.insert_tree_node(self.feed_tree.GetRootItem(), folder, 1)
+            self.refresh_tree_node(folder)
+
+        for feed in changes.moved_feeds:
+            # wx can't reparent a tree item, so moving a feed means recreating it (add_feed_node keeps its icon)
+            old_item_id = self.feed_tree_items.pop(feed.id, None)
+            if old_item_id is not None:
+                self.feed_tree.Delete(old_item_id)
+            # the folder may be hidden by the unread filter, in which case the filter adds the feed if it needs to
+            if feed.folder_id in self.folder_tree_items:
+                self.add_feed_node(feed, self.insert_tree_node(self.folder_tree_items[feed.folder_id], feed, 0))
+
+        for folder in changes.removed_folders:
+            folder_item_id = self.folder_tree_items.pop(folder.id, None)
+            if folder_item_id is not None:
+                self.feed_tree.Delete(folder_item_id)
+
+        for feed in changes.added_feeds:
+            if feed.folder_id in self.folder_tree_items and self.is_node_visible(feed, selected_node):
+                self.add_feed_node(feed, self.insert_tree_node(self.folder_tree_items[feed.folder_id], feed, 0))
+
+        # new folders start expanded, like everything does on startup
+        for folder in changes.added_folders:
+            if self.feed_tree.ItemHasChildren(self.folder_tree_items[folder.id]):
+                self.feed_tree.Expand(self.folder_tree_items[folder.id])
+
+        for feed in changes.changed_icons:
+            # a hidden feed fetches its new icon when the filter next shows it
+            self.feed_icons.pop(feed.id, None)
+            self.requested_icons.discard(feed.id)
+            if feed.has_icon and feed.id in self.feed_tree_items:
+                self.requested_icons.add(feed.id)
+                self.icon_loader.load(feed.id)
+
+        for node in changes.changed_nodes:
+            self.refresh_tree_node(node)
+        if changes.changed_nodes:
+            self.refresh_tree_node(self.model.river)
+
+    def on_toggle_unread_filter(self, event):
+        self.show_unread_only = not self.show_unread_only
+        self.apply_feed_filter()
+
+    def is_node_visible(self, node, selected_node):
+        # the selected node stays visible even once it has been read, so it doesn't vanish while you're reading it
+        return not self.show_unread_only or node.unread > 0 or node is selected_node or \
+            (isinstance(selected_node, Feed) and node is self.model.folder_for_feed(selected_node.id))
+
+    @traced('tree filter')
+    def apply_feed_filter(self):
+        # walk the model in tree order, deleting nodes that should be hidden and inserting ones that should be
+        # shown directly after the previous visible node, so each change is O(1) and untouched nodes stay put
+        selected_node = self.get_selected_node()
+        root_item_id = self.feed_tree.GetRootItem()
+        self.feed_tree.Freeze()
+        try:
+            previous_item_id = self.river_tree_item
+            for folder in self.model.sorted_folders():
+                folder_item_id = self.folder_tree_items.get(folder.id)
+                if not self.is_node_visible(folder, selected_node):
+                    if folder_item_id is not None:
+                        for feed_id in folder.feed_ids:
+                            self.feed_tree_items.pop(feed_id, None)
+                        del self.folder_tree_items[folder.id]
+                        self.feed_tree.Delete(folder_item_id)
+                    continue
+                if folder_item_id is None:
+                    folder_item_id = self.insert_tree_node_after(root_item_id, previous_item_id, folder, 1)
+                    self.folder_tree_items[folder.id] = folder_item_id
+                    self.refresh_tree_node(folder)
+                previous_item_id = folder_item_id
+                self.apply_feed_filter_to_folder(folder, folder_item_id, None, selected_node)
+                if self.feed_tree.ItemHasChildren(folder_item_id):
+                    self.feed_tree.Expand(folder_item_id)
+
+            # feeds that aren't in a folder come after all the folders
+            root_folder = self.model.folders[FeedModel.ROOT_FOLDER_ID]
+            self.apply_feed_filter_to_folder(root_folder, root_item_id, previous_item_id, selected_node)
+        finally:
+            self.feed_tree.Thaw()
+
+    def apply_feed_filter_to_folder(self, folder, folder_item_id, previous_item_id, selected_node):
+        for feed in self.model.sorted_feeds(folder):
+            feed_item_id = self.feed_tree_items.get(feed.id)
+            if not self.is_node_visible(feed, selected_node):
+                if feed_item_id is not None:
+                    del self.feed_tree_items[feed.id]
+                    self.feed_tree.Delete(feed_item_id)
+                continue
+            if feed_item_id is None:
+                feed_item_id = self.insert_tree_node_after(folder_item_id, previous_item_id, feed, 0)
+                self.add_feed_node(feed, feed_item_id)
+            previous_item_id = feed_item_id
+
+    def insert_tree_node_after(self, parent_item_id, previous_item_id, node, image):
+        if previous_item_id is None:
+            return self.feed_tree.PrependItem(parent_item_id, node.title, image, -1, node)
+        return self.feed_tree.InsertItem(parent_item_id, previous_item_id, node.title, image, -1, node)
+
+    def insert_tree_node(self, parent_item_id, node, image):
+        # keep the same order as Yarr (folders before feeds, each sorted by title) without rebuilding the tree
+        position = 0
+        child_item_id, cookie = self.feed_tree.GetFirstChild(parent_item_id)
+        while child_item_id.IsOk():
+            child = self.feed_tree.GetItemData(child_item_id)
+            if isinstance(child, River) or (isinstance(node, Feed) and not isinstance(child, Feed)):
+                position += 1
+            elif isinstance(child, type(node)) and child.title.lower() < node.title.lower():
+                position += 1
+            else:
+                break
+            child_item_id, cookie = self.feed_tree.GetNextChild(parent_item_id, cookie)
+        return self.feed_tree.InsertItem(parent_item_id, position, node.title, image, -1, node)
+
+    def refresh_tree_node(self, node):
+        # update the label and font of a single feed or folder from the model, e.g. "Feed title (3)" in bold
+        if isinstance(node, Feed):
+            tree_item_id = self.feed_tree_items.get(node.id)
+        elif isinstance(node, River):
+            tree_item_id = self.river_tree_item
+        else:
+            tree_item_id = self.folder_tree_items.get(node.id)
+        if tree_item_id is None or not tree_item_id.IsOk() or tree_item_id == self.feed_tree.GetRootItem():
+            return
+
+        if node.unread > 0:
+            self.feed_tree.SetItemText(tree_item_id, f"{node.title} ({node.unread})")
+            self.feed_tree.SetItemFont(tree_item_id, self.feed_tree.GetFont().Bold())
+        else:
+            self.feed_tree.SetItemText(tree_item_id, node.title)
+            self.feed_tree.SetItemFont(tree_item_id, self.feed_tree.GetFont())
+
+    def refresh_feed_and_folder(self, feed):
+        self.refresh_tree_node(feed)
+        self.refresh_tree_node(self.model.folder_for_feed(feed.id))
+        self.refresh_tree_node(self.model.river)
+
+    def get_current_tree_item(self):
+        # the tree allows more than one selection, so GetSelection() can't be used; the current item is the
+        # focused one if it's selected, otherwise the first selection
+        focused_item = self.feed_tree.GetFocusedItem()
+        if focused_item.IsOk() and self.feed_tree.IsSelected(focused_item):
+            return focused_item
+        selections = self.feed_tree.GetSelections()
+        return selections[0] if selections else wx.TreeItemId()
+
+    def select_tree_item(self, tree_item_id):
+        # select just this item, as a plain click does
+        self.feed_tree.UnselectAll()
+        self.feed_tree.SelectItem(tree_item_id)
+        self.feed_tree.SetFocusedItem(tree_item_id)
+
+    def get_selected_node(self):
+        # the Feed, Folder or River shown in the item list
+        selection = self.get_current_tree_item()
+        if not selection.IsOk():
+            return None
+        return self.feed_tree.GetItemData(selection)
+
+    def get_selected_feed(self):
+        node = self.get_selected_node()
+        return node if isinstance(node, Feed) else None
 
     # TreeCtrl requires double-click to expand/collapse items by default
     # This method allows expanding/collapsing items with a single click by using EVT_LEFT_DOWN
@@ -232,14 +588,19 @@ class YaffleFrame(wx.Frame):
             event.Skip()
             return
 
+        # leave ctrl/shift-clicks to the tree so they add to the selection
+        if event.CmdDown() or event.ShiftDown():
+            event.Skip()
+            return
+
         # if you click the icon of a folder or +/-, expand/collapse it
         # otherwise select the item if it wasn't already selected
         if self.clicked_folder_or_expander(hit_test_flags):
             if self.feed_tree.ItemHasChildren(tree_item_id):
                 self.feed_tree.Toggle(tree_item_id)
         else:
-            if self.feed_tree.IsSelected(tree_item_id) is not True:
-                self.feed_tree.SelectItem(tree_item_id)
+            if self.feed_tree.IsSelected(tree_item_id) is not True or len(self.feed_tree.GetSelections()) > 1:
+                self.select_tree_item(tree_item_id)
 
     def clicked_folder_or_expander(self, hit_test_flags):
         # if the mouse is over the expander or the icon of a folder, return True
@@ -247,125 +608,290 @@ class YaffleFrame(wx.Frame):
             (hit_test_flags & wx.TREE_HITTEST_ONITEMBUTTON) == wx.TREE_HITTEST_ONITEMBUTTON
 
     def populate_item_list(self, feed_id):
-        response = requests.get(f"{self.YARR_URL}/api/items?feed_id={feed_id}")
-        data = response.json()
+        self.load_item_list({'feed_id': feed_id})
+
+    def populate_river(self, folder_id=None):
+        # Yarr merges the unread items of every feed (or a folder's feeds) by date itself, so a river pages
+        # through one /api/items listing just like a single feed. The listing shrinks as items are read, so
+        # pages are kept rather than fetched again; the rows are small and only pages scrolled to are loaded.
+        self.load_item_list({'folder_id': folder_id, 'status': 'unread'}, page_cache_size=None)
+
+    @traced('list populate')
+    def load_item_list(self, filters, page_cache_size=PagedItemLoader.PAGE_CACHE_SIZE):
+        # the list is virtual: rows are drawn from pages fetched as they come into view, starting with the first
+        fetch_local_page = None
+        if self.article_store is not None:
+            fetch_local_page = partial(self.fetch_local_item_page, filters)
+        loader = PagedItemLoader(partial(self.fetch_item_page, filters), self.background_tasks, self.on_item_page_loaded,
+                                 page_cache_size=page_cache_size, fetch_local_page=fetch_local_page)
+        self.item_list.set_loader(loader)
+        loader.load_local_first_page()
+
+    def show_tree_node(self, node):
+        # fill the item list from a feed, a folder's unread items, or everything unread
+        if isinstance(node, Feed):
+            self.populate_item_list(node.id)
+        elif isinstance(node, Folder):
+            self.populate_river(node.id)
+        elif isinstance(node, River):
+            self.populate_river()
+        else:
+            self.item_list.set_loader(None)
+            return
+        self.SetTitle(node.title + ' - Yaffle')
 
-        bold_font = wx.SystemSettings.GetFont(wx.SYS_DEFAULT_GUI_FONT)
-        bold_font.SetWeight(wx.FONTWEIGHT_BOLD)
+    def on_search_text(self, event):
+        # wait for a pause in typing rather than searching on every keystroke
+        if self.search_timer is not None:
+            self.search_timer.Stop()
+        self.search_timer = wx.CallLater(150, self.run_search)
 
-        normal_font = wx.SystemSettings.GetFont(wx.SYS_DEFAULT_GUI_FONT)
-        normal_font.SetWeight(wx.FONTWEIGHT_NORMAL)
+    def on_search_cancel(self, event):
+        self.search_ctrl.ChangeValue('')
+        self.run_search()
 
-        for index, feed_item in enumerate(data["list"]):
-            item_title = self.get_item_title(feed_item)
-            item = self.item_list.InsertItem(index, item_title)
-            self.item_list.SetItemData(item, feed_item['id'])
+    def run_search(self):
+        if not self:
+            return
+        query = self.search_ctrl.GetValue().strip()
+        self.background_tasks.cancel('article')
+        if not query:
+            # back to whatever is selected in the tree
+            self.show_tree_node(self.get_selected_node())
+            return
 
-            # if the item is unread, set the font to bold
-            if feed_item['status'] == "unread":
-                self.item_list.SetItemFont(item, bold_font)
-            else:
-                # we must set a default font in order to check for unread items later
-                self.item_list.SetItemFont(item, normal_font)
-
-    def get_item_title(self, feed_item):
-        if 'title' in feed_item and len(feed_item['title']) > 0:
-            return str(feed_item['title'])
-        elif 'date' in feed_item and len(feed_item['date']) > 0:
-            return str(feed_item['date'])
-        else:
-            return "Untitled"
+        # results are a single ranked page, shown in the same list as a feed's items
+        loader = PagedItemLoader(partial(self.search_items, query), self.background_tasks, self.on_item_page_loaded)
+        self.item_list.set_loader(loader)
+        self.SetTitle(f"Search: {query} - Yaffle")
+
+    @traced('search')
+    def search_items(self, query, after):
+        if after is not None:
+            return {'list': [], 'has_more': False}
+        data = self.article_store.search(query)
+        data['list'] = [ItemRow.from_json(item) for item in data['list']]
+        return data
+
+    def fetch_item_page(self, filters, after):
+        # items become rows as they're parsed, so a page is never held as dicts
+        data = self.yarr_client.get_items(after=after, make_item=ItemRow.from_json, **filters)
+        if self.article_store is not None:
+            self.article_store.upsert_items([row.to_json() for row in data['list']])
+        return data
+
+    def fetch_local_item_page(self, filters, after):
+        data = self.article_store.get_items_page(after=after, **filters)
+        data['list'] = [ItemRow.from_json(item) for item in data['list']]
+        return data
+
+    @traced('list page')
+    def on_item_page_loaded(self, page_number, items):
+        self.model.set_items(items)
+        # the server won't know about changes that are still queued, so keep showing the local state
+        read_feed_ids = self.status_queue.pending_read_feed_ids(self.model.folders)
+        for item in items:
+            pending_status = self.status_queue.pending_item_status(item.id)
+            if pending_status is not None:
+                self.model.items[item.id].status = pending_status
+            elif item.feed_id in read_feed_ids:
+                self.model.items[item.id].status = 'read'
+        self.item_list.on_page_loaded(page_number)
+        if page_number == 0:
+            self.prefetch_unread_items()
 
     def on_feed_tree_item_selected(self, event):
-        self.item_list.DeleteAllItems()
-        # if user has clicked a folder, do nothing
-        if self.feed_tree.ItemHasChildren(event.GetItem()):
+        # with multiple selection this also fires for items being deselected, which shouldn't change the list
+        if not event.GetItem().IsOk() or not self.feed_tree.IsSelected(event.GetItem()):
             return
 
-        feed_id = self.feed_tree.GetItemData(event.GetItem())
-        self.populate_item_list(feed_id)
-        self.SetTitle(self.feed_tree.GetItemText(event.GetItem()) + ' - Yaffle')
+        # anything still loading was for the old list
+        self.item_list.set_loader(None)
+        self.background_tasks.cancel('article')
+
+        # picking a feed, folder or "All unread" replaces any search results
+        self.search_ctrl.ChangeValue('')
+        self.show_tree_node(self.feed_tree.GetItemData(event.GetItem()))
 
     def on_tree_item_right_click(self, event):
-        feed_id = self.feed_tree.GetItemData(event.GetItem())
+        # right-clicking part of a multiple selection acts on all of it, otherwise just on the item clicked
+        tree_item_id = event.GetItem()
+        if self.feed_tree.IsSelected(tree_item_id):
+            nodes = [self.feed_tree.GetItemData(selected_item) for selected_item in self.feed_tree.GetSelections()]
+        else:
+            nodes = [self.feed_tree.GetItemData(tree_item_id)]
+
+        feed_ids = set()
+        for node in nodes:
+            if isinstance(node, Feed):
+                feed_ids.add(node.id)
+            elif isinstance(node, Folder):
+                feed_ids.update(node.feed_ids)
+            elif isinstance(node, River):
+                feed_ids.update(self.model.feeds)
+        if not feed_ids:
+            return
+        self.context_menu_feed_ids = feed_ids
 
         menu = wx.Menu()
-        menu.Append(101, 'Mark all feed items as read')
-        menu.Append(102, 'Rename this feed')
-        self.Bind(wx.EVT_MENU, partial(self.on_context_menu_item_selected, feed_id=feed_id))
+        if len(nodes) > 1:
+            menu.Append(self.mark_read_menu_id, 'Mark all selected items as read')
+        elif isinstance(nodes[0], Folder):
+            menu.Append(self.mark_read_menu_id, 'Mark all folder items as read')
+        elif isinstance(nodes[0], River):
+            menu.Append(self.mark_read_menu_id, 'Mark everything as read')
+        else:
+            menu.Append(self.mark_read_menu_id, 'Mark all feed items as read')
+            menu.Append(102, 'Rename this feed')
 
         self.PopupMenu(menu)
 
         menu.Destroy()
 
-    def on_context_menu_item_selected(self, event, feed_id):
-        menu_item_id = event.GetId()
-        if menu_item_id == 101:
-            print(f'Menu Item 1 selected for feed: {feed_id}')
-            self.mark_feed_as_read(feed_id)
+    def on_mark_read_menu_item(self, event):
+        self.mark_feeds_as_read(self.context_menu_feed_ids)
 
 
     def on_feed_item_selected(self, event):
         item_index = event.GetIndex()
-        item_title = self.item_list.GetItemText(item_index)
-        item_id = self.item_list.GetItemData(item_index)
-
-        response = requests.get(f"{self.YARR_URL}/api/items/{item_id}")
-        data = response.json()
-
-        item_content = data['content']
-        dt = datetime.fromisoformat(data['date'])
-        item_date = dt.strftime("%#d %B %Y at %H:%M")
-
-        content_start = f"""<!DOCTYPE html><html lang="en"><head>
-        <link rel="stylesheet" href="{self.YARR_URL}/static/stylesheets/bootstrap.min.css">
-        <link rel="stylesheet" href="{self.YARR_URL}/static/stylesheets/app.css">
-        <style>.content-wrapper {{ margin: 0 auto 0 1em !important; }} h1 a {{text-decoration: none !important;}} .content-body a {{position:relative}} .content-body a[href^="http"]:hover::after {{ content: attr(href); position: absolute; left: 2em; top: -2em; min-width: 200px; border: 1px #aaaaaa solid; background-color: #ffffcc; border-radius: 10px; padding: 6px; color: #000000; font-size: 14px; z-index: 1; text-wrap: nowrap;}}</style>
-        </head><body>
-        <div class="content px-4 pt-3 pb-5 border-top overflow-auto" style="font-size: 1rem;"><div class="content-wrapper">
-"""
-        content_end = "</div></div></body>"
-
-        content_metadata = f"""
-<div class="text-muted"><div>{self.feed_tree.GetItemText(self.feed_tree.GetSelection())}</div> <time>{item_date}</time></div>
-"""
-
-        content = f"{content_start}<h1><a href=\"{data['link']}\">{item_title}</a></h1>{content_metadata}<hr><div class='content-body'>{item_content}</div>{content_end}"
-
-        self.web_view.SetPage(content, "")
+        item = self.item_list.get_item(item_index)
+        # loading placeholders aren't real items
+        if item is None:
+            return
+        item_title = get_item_title(item)
+        item_id = item.id
+        if self.web_view is None:
+            self.create_article_view()
+
+        data = self.content_cache.get(item_id)
+        if data is None and self.article_store is not None:
+            # a local disk read is quick enough to do here, and saves a round trip to Yarr
+            data = self.article_store.get_item(item_id)
+            if data is not None:
+                self.content_cache.put(item_id, data)
+        if data is not None:
+            # already fetched or prefetched, so render straight away and drop anything still in flight
+            self.background_tasks.cancel('article')
+            self.show_item(item_id, item_index, item_title, data)
+        else:
+            # only the latest selection is shown, so holding down an arrow key doesn't queue up a fetch per row
+            self.background_tasks.submit_latest('article', partial(self.fetch_item, item_id),
+                                                partial(self.show_item, item_id, item_index, item_title),
+                                                partial(self.on_item_failed, item_id))
+
+            # most articles arrive quickly, so only show the loading page if this one is taking a while
+            self.pending_item_id = item_id
+            wx.CallLater(150, self.show_item_loading, item_id)
+
+        self.prefetch_neighbours(item_index)
+
+    def fetch_item(self, item_id):
+        # runs on a worker thread, for both articles being opened and prefetching
+        data = self.yarr_client.get_item(item_id)
+        self.content_cache.put(item_id, data)
+        if self.article_store is not None:
+            self.article_store.upsert_items([data])
+        self.image_prefetcher.prefetch(data)
+        return data
+
+    def prefetch_neighbours(self, item_index):
+        loader = self.item_list.loader
+        if loader is None:
+            return
+        # nearest first, so the article you're most likely to open next is fetched first
+        item_ids = []
+        for offset in range(1, self.PREFETCH_NEIGHBOURS + 1):
+            for index in (item_index + offset, item_index - offset):
+                item = loader.peek(index)
+                if item is not None:
+                    item_ids.append(item.id)
+        self.content_prefetcher.prefetch(item_ids)
+
+    def prefetch_unread_items(self):
+        loader = self.item_list.loader
+        if loader is None:
+            return
+        unread_ids = []
+        for item in loader.loaded_items():
+            model_item = self.model.items.get(item.id)
+            if model_item is not None and model_item.status == 'unread':
+                unread_ids.append(item.id)
+                if len(unread_ids) == self.PREFETCH_UNREAD:
+                    break
+        self.content_prefetcher.prefetch(unread_ids)
+
+    def show_item_loading(self, item_id):
+        if self and self.pending_item_id == item_id:
+            self.article_renderer.show_loading()
+
+    def on_item_failed(self, item_id, error):
+        print(f"Failed to fetch item {item_id}: {error}")
+        self.pending_item_id = None
+
+    @traced('article render')
+    def show_item(self, item_id, item_index, item_title, data):
+        self.pending_item_id = None
+        # search results and rivers can include items from feeds the model doesn't know (yet, or any more)
+        feed = self.model.feeds.get(data['feed_id'])
+        self.article_renderer.show_article(data, item_title, feed.title if feed is not None else '')
         self.mark_item_as_read(item_id, item_index)
 
     def on_webview_navigating(self, event):
         if(event.GetNavigationAction() == wx.html2.WEBVIEW_NAV_ACTION_USER and event.GetURL() != "about:blank" and not event.GetURL().startswith("data:text/html")):
             webbrowser.open(event.GetURL())
+            # the web view holds the article shell, which articles are swapped into by script, so it must never
+            # navigate away from it
+            event.Veto()
 
-    def mark_feed_as_read(self, feed_id):
-        requests.put(f"{self.YARR_URL}/api/items?feed_id={feed_id}&status=unread") # mark all items as read
-        # TODO: mark the feed as read in the tree - use the code from the method below refactored into a separate method
+    def mark_feeds_as_read(self, feed_ids):
+        feed_ids = {feed_id for feed_id in feed_ids if feed_id in self.model.feeds}
+        if not feed_ids:
+            return
+        # a whole folder goes as one request, so marking a folder (or all of its feeds) costs a single call
+        for kind, id, group_feed_ids in self.model.mark_read_groups(feed_ids):
+            self.status_queue.mark_read(kind, id, group_feed_ids)
+        if self.article_store is not None:
+            self.background_tasks.submit(partial(self.article_store.mark_items_read, list(feed_ids)))
+
+        # update everything on screen straight away rather than waiting for Yarr
+        changed_feeds = self.model.mark_feeds_read(feed_ids)
+        changed_folders = {feed.folder_id: self.model.folder_for_feed(feed.id) for feed in changed_feeds}
+        for node in changed_feeds + list(changed_folders.values()) + [self.model.river]:
+            self.refresh_tree_node(node)
+        if self.show_unread_only and changed_feeds:
+            self.apply_feed_filter()
+        # the list draws read/unread from the model, so redrawing it is enough
+        self.item_list.Refresh()
 
     def mark_item_as_read(self, item_id, item_index):
-        requests.put(f"{self.YARR_URL}/api/items/{item_id}", json={"status": "read"})
+        self.queue_item_status(item_id, 'read')
 
-        # set the item font to normal
-        normal_font = wx.SystemSettings.GetFont(wx.SYS_DEFAULT_GUI_FONT)
-        normal_font.SetWeight(wx.FONTWEIGHT_NORMAL)
-        self.item_list.SetItemFont(item_index, normal_font)
+        # the model keeps the unread counts, so only the feed and its folder need redrawing
+        feed = self.model.set_item_status(item_id, 'read')
+        if feed is not None:
+            self.refresh_feed_and_folder(feed)
+        # the list draws its fonts from the model, so the row just needs redrawing
+        self.item_list.RefreshItem(item_index)
 
-        # if no more unread items in the list, mark the feed as read
-        if not any([self.item_list.GetItemFont(index).GetWeight() == wx.FONTWEIGHT_BOLD \
-                for index in range(self.item_list.GetItemCount())]):
-            normal_font = wx.SystemSettings.GetFont(wx.SYS_DEFAULT_GUI_FONT)
-            normal_font.SetWeight(wx.FONTWEIGHT_NORMAL)
-            self.feed_tree.SetItemFont(self.feed_tree.GetSelection(), normal_font)
+    def queue_item_status(self, item_id, status):
+        model_item = self.model.items.get(item_id)
+        self.status_queue.set_item_status(item_id, model_item.feed_id if model_item is not None else None, status)
+        if self.article_store is not None:
+            self.background_tasks.submit(partial(self.article_store.update_item_status, item_id, status))
 
     def mark_item_as_unread(self, item_id, item_index):
-        requests.put(f"{self.YARR_URL}/api/items/{item_id}", json={"status": "unread"})
-        normal_font = wx.SystemSettings.GetFont(wx.SYS_DEFAULT_GUI_FONT)
-        normal_font.SetWeight(wx.FONTWEIGHT_BOLD)
-        self.item_list.SetItemFont(item_index, normal_font)
+        self.queue_item_status(item_id, 'unread')
+        feed = self.model.set_item_status(item_id, 'unread')
+        if feed is not None:
+            self.refresh_feed_and_folder(feed)
+        self.item_list.RefreshItem(item_index)
 
 if __name__ == '__main__':
+    # --profile-startup reports how long each part of startup took, then quits
+    profile_startup = '--profile-startup' in sys.argv
     app = wx.App()
-    frame = YaffleFrame()
+    frame = YaffleFrame(profile_startup)
     frame.Show()
+    if profile_startup:
+        wx.CallAfter(frame.report_startup)
     app.MainLoop()
@@ -0,0 +1,107 @@
+import threading
+
+from json_stream import parse_list_response
+from tracing import Tracer
+
+class YarrClient:
+
+    DEFAULT_TIMEOUT = 10 # seconds
+    DEFAULT_RETRIES = 3
+    POOL_SIZE = 10
+    CHUNK_SIZE = 16 * 1024 # bytes read at a time from streamed responses
+
+    def __init__(self, yarr_url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, pool_size=POOL_SIZE, tracer=None):
+        self.yarr_url = yarr_url.rstrip('/')
+        self.timeout = timeout
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.retries = retries
+        self.pool_size = pool_size
+
+        # every call shares one session so connections to Yarr are kept alive and reused across threads.
+        # requests takes longer to import than the rest of startup put together, so the session is made on the
+        # first call - which is on a worker thread - rather than here.
+        self.session = None
+        self.session_lock = threading.Lock()
+
+    def get_session(self):
+        with self.session_lock:
+            if self.session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                session = requests.Session()
+                retry = Retry(total=self.retries, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                              allowed_methods=frozenset(['GET', 'PUT']), raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.session = session
+            return self.session
+
+    @classmethod
+    def from_config(cls, config, tracer=None):
+        return cls(config['YARR_URL'],
+                   timeout=config.getfloat('timeout', fallback=cls.DEFAULT_TIMEOUT),
+                   retries=config.getint('retries', fallback=cls.DEFAULT_RETRIES),
+                   tracer=tracer)
+
+    def request(self, method, endpoint, path, **kwargs):
+        # endpoint is the path template (e.g. "GET /api/items/{id}") so spans are grouped per endpoint, not per URL
+        with self.tracer.span(endpoint):
+            return self.get_session().request(method, f"{self.yarr_url}{path}", timeout=self.timeout, **kwargs)
+
+    def get_json(self, endpoint, path, **kwargs):
+        response = self.request('GET', endpoint, path, **kwargs)
+        response.raise_for_status()
+        with self.tracer.span(f"parse {endpoint}"):
+            return response.json()
+
+    def get_status(self):
+        return self.get_json('GET /api/status', '/api/status')
+
+    def get_folders(self):
+        return self.get_json('GET /api/folders', '/api/folders')
+
+    def get_feeds(self):
+        return self.get_json('GET /api/feeds', '/api/feeds')
+
+    def get_feed_icon(self, feed_id, headers=None):
+        # returns the raw response so the caller can deal with 304s and non-image content types
+        return self.request('GET', 'GET /api/feeds/{id}/icon', f"/api/feeds/{feed_id}/icon", headers=headers)
+
+    def get_items(self, feed_id=None, folder_id=None, status=None, after=None, make_item=None):
+        # The list is parsed as it downloads rather than with response.json(), and each item is passed through
+        # make_item (e.g. to turn it into a compact row) as soon as it's complete, so the body and the full set
+        # of dicts never exist at once. The request's span only covers the headers; the download is in the
+        # parse span.
+        params = {'feed_id': feed_id, 'folder_id': folder_id, 'status': status, 'after': after}
+        response = self.request('GET', 'GET /api/items', '/api/items', stream=True,
+                                params={key: value for key, value in params.items() if value is not None})
+        with response:
+            response.raise_for_status()
+            with self.tracer.span('parse GET /api/items'):
+                return parse_list_response(response.iter_content(self.CHUNK_SIZE), 'list', make_item)
+
+    def get_item(self, item_id):
+        return self.get_json('GET /api/items/{id}', f"/api/items/{item_id}")
+
+    def get_stylesheet(self, name):
+        response = self.request('GET', 'GET /static/stylesheets/{name}', f"/static/stylesheets/{name}")
+        response.raise_for_status()
+        return response.text
+
+    def update_item_status(self, item_id, status):
+        response = self.request('PUT', 'PUT /api/items/{id}', f"/api/items/{item_id}", json={'status': status})
+        response.raise_for_status()
+
+    def mark_items_read(self, feed_id=None, folder_id=None):
+        # Yarr marks every item matching the filter as read in a single call
+        params = {'feed_id': feed_id, 'folder_id': folder_id}
+        response = self.request('PUT', 'PUT /api/items', '/api/items',
+                                params={key: value for key, value in params.items() if value is not None})
+        response.raise_for_status()
+
+    def close(self):
+        with self.session_lock:
+            if self.session is not None:
+                self.session.close()